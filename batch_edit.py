@@ -0,0 +1,159 @@
+"""Apply bulk changes to parameters.json files without starting the editor.
+
+Examples:
+
+    python batch_edit.py servers/*/parameters.json --id "weapon_*" --set IsDisabledForSpawning=true
+    python batch_edit.py parameters.json --where "CooldownGroup=Ammo" --scale CooldownPerSquadMemberMin=1.5
+    python batch_edit.py a.json b.json --where "AllowedLocations~Coastal" --append Variations=Rusty --jobs 4
+
+Operations run in the order given on every row that matches --id and all
+--where conditions. Values use the same rules as editing a cell in the
+editor. Files are rewritten in place unless --output-dir or --dry-run is
+given; with --output-dir, each file keeps its path relative to the folder
+the input files have in common.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from parameters_core import (OPERATIONS, ParameterStore, apply_operation, column_index,
+                             compile_predicate, load_document, match_rows, save_document)
+
+
+class OperationAction(argparse.Action):
+    """Collect --set/--scale/--append into one list, keeping their command line order"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        name, separator, argument = values.partition("=")
+        if not separator:
+            parser.error(f"{option_string} expects COLUMN=VALUE, got '{values}'")
+        operations = getattr(namespace, self.dest) or []
+        operations.append((self.const, name, argument))
+        setattr(namespace, self.dest, operations)
+
+
+def process_file(file_path, id_pattern, conditions, operations, output_path, dry_run):
+    """Edit one file and return a summary of what happened"""
+    started = time.perf_counter()
+    summary = {"file": file_path, "rows": 0, "matched": 0, "changed": 0, "error": None}
+    try:
+        predicates = [compile_predicate(condition) for condition in conditions]
+        compiled = [(column_index(name), OPERATIONS[kind](name, argument))
+                    for kind, name, argument in operations]
+
+        document = load_document(file_path)
+        store = document.get("Parameters")
+        if not isinstance(store, ParameterStore):
+            raise ValueError("No Parameters array")
+
+        rows = match_rows(store, id_pattern, predicates)
+        changed = set()
+        for column, function in compiled:
+            changed.update(apply_operation(store, rows, column, function))
+        summary.update(rows=len(store), matched=len(rows), changed=len(changed))
+
+        if not dry_run and (changed or output_path != file_path):
+            save_document(document, output_path)
+    except Exception as e:
+        summary["error"] = str(e)
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def output_paths(files, output_dir):
+    """Where each of files is written: its path relative to the files' common folder, under output_dir.
+
+    Raises ValueError if two files would be written to the same place.
+    """
+    if not output_dir:
+        return list(files)
+    folders = [os.path.dirname(os.path.abspath(file_path)) for file_path in files]
+    try:
+        root = os.path.commonpath(folders)
+    except ValueError:
+        raise ValueError("--output-dir needs all files on the same drive")
+    paths = [os.path.join(output_dir, os.path.relpath(os.path.abspath(file_path), root)) for file_path in files]
+    seen = {}
+    for file_path, output_path in zip(files, paths):
+        key = os.path.normcase(os.path.abspath(output_path))
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {file_path} would both be written to {output_path}")
+        seen[key] = file_path
+    return paths
+
+
+def format_summary(summary, dry_run):
+    if summary["error"]:
+        return f"{summary['file']}: FAILED: {summary['error']}"
+    action = "would change" if dry_run else "changed"
+    return (f"{summary['file']}: {summary['matched']}/{summary['rows']} rows matched, "
+            f"{summary['changed']} {action} ({summary['seconds']:.2f}s)")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Bulk edit SCUM parameters.json files",
+        epilog="Conditions take the form COLUMN OP VALUE with OP one of = != < <= > >= ~ "
+               "(~ means contains).")
+    parser.add_argument("files", nargs="+", help="parameters.json files to edit")
+    parser.add_argument("--id", dest="id_pattern", metavar="PATTERN",
+                        help="only rows whose Id matches this glob pattern (case-insensitive)")
+    parser.add_argument("--where", dest="conditions", action="append", default=[], metavar="CONDITION",
+                        help="only rows matching this condition; may be repeated")
+    parser.add_argument("--set", dest="operations", action=OperationAction, const="set",
+                        metavar="COLUMN=VALUE", help="set COLUMN to VALUE")
+    parser.add_argument("--scale", dest="operations", action=OperationAction, const="scale",
+                        metavar="COLUMN=FACTOR", help="multiply a numeric COLUMN by FACTOR")
+    parser.add_argument("--append", dest="operations", action=OperationAction, const="append",
+                        metavar="COLUMN=VALUE", help="add VALUE to a list COLUMN if it is not there yet")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--output-dir", metavar="DIR",
+                        help="write edited files to DIR, under their paths relative to the folder "
+                             "the files have in common, instead of replacing them")
+    output.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of files to process in parallel (default: CPU count)")
+    args = parser.parse_args(argv)
+    if not args.operations:
+        parser.error("no operation given; use --set, --scale or --append")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Check conditions and operations once up front instead of failing in every worker
+    try:
+        for condition in args.conditions:
+            compile_predicate(condition)
+        for kind, name, argument in args.operations:
+            column_index(name)
+            OPERATIONS[kind](name, argument)
+        outputs = output_paths(args.files, args.output_dir)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.output_dir:
+        for output_path in outputs:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(args.files)))) as executor:
+        futures = []
+        for file_path, output_path in zip(args.files, outputs):
+            futures.append(executor.submit(process_file, file_path, args.id_pattern, args.conditions,
+                                           args.operations, output_path, args.dry_run))
+        # Report each file as soon as it is done
+        for future in as_completed(futures):
+            summary = future.result()
+            if summary["error"]:
+                failed += 1
+            print(format_summary(summary, args.dry_run), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Generate synthetic SCUM parameters.json files for benchmarking.
+
+    python benchmarks/generate_parameters.py 100000 parameters_100k.json
+
+The Ids, list contents and cooldown groups follow the shape of the real
+file: a few hundred item families with many numbered variants, a small
+set of locations, mostly empty Variations, and cooldown groups whose use
+is heavily skewed towards a handful of names.
+"""
+import argparse
+import json
+import random
+
+FAMILIES = [
+    "Weapon_AK47", "Weapon_M1911", "Weapon_MP5", "Weapon_SVD", "Weapon_Compound_Bow",
+    "Cal_5_56x45mm", "Cal_7_62x39mm", "Cal_9mm", "Cal_12_Gauge", "Cal_22",
+    "Magazine_AK47", "Magazine_M9", "Backpack", "Hiking_Boots", "Military_Jacket",
+    "Bandage", "Painkillers", "Antibiotics", "Canned_Beans", "Apple", "Water_Bottle",
+    "Hammer", "Crowbar", "Lockpick", "Car_Battery", "Gasoline_Canister", "Fishing_Rod",
+]
+SUFFIXES = ["", "_Rusty", "_Worn", "_Camo", "_Black", "_Ammobox", "_Tier1", "_Tier2", "_Tier3"]
+LOCATIONS = ["Coastal", "Continental", "Mountain"]
+VARIATIONS = ["Rusty", "Worn", "Camo", "Black", "Desert", "Forest", "Snow", "Urban"]
+GROUPS = ["Weapons", "Ammo", "Magazines", "Clothes", "Medical", "Food", "Tools", "Vehicles",
+          "Fishing", "Crafting"] + [f"Group_{i}" for i in range(40)]
+
+
+def generate_record(rng, row):
+    family = rng.choice(FAMILIES)
+    minimum = rng.choice([0, 0, 5, 10, 15, 30, 60, 120])
+    locations = rng.choice([[], LOCATIONS, LOCATIONS[:1], LOCATIONS[:2], LOCATIONS[1:]])
+    variations = rng.sample(VARIATIONS, rng.choice([0, 0, 0, 0, 1, 2, 3]))
+    override = rng.random() < 0.05
+    return {
+        "Id": f"{family}{rng.choice(SUFFIXES)}_{row}",
+        "IsDisabledForSpawning": rng.random() < 0.1,
+        "AllowedLocations": list(locations),
+        "CooldownPerSquadMemberMin": minimum,
+        "CooldownPerSquadMemberMax": minimum + rng.choice([0, 5, 10, 30, 60]),
+        # Zipf-like: the first few groups are used by most rows
+        "CooldownGroup": GROUPS[min(int(rng.paretovariate(1.2)) - 1, len(GROUPS) - 1)],
+        "Variations": variations,
+        "ShouldOverrideInitialAndRandomUsage": override,
+        "InitialUsageOverride": rng.randint(1, 100) if override else 0,
+        "RandomUsageOverrideUsage": rng.randint(1, 100) if override else 0,
+    }
+
+
+def generate(rows, file_path, seed=0):
+    """Write rows records to file_path, formatted like json.dump(..., indent=4)"""
+    rng = random.Random(seed)
+    with open(file_path, 'w') as f:
+        if not rows:
+            f.write('{\n    "Parameters": []\n}')
+            return
+        # Records are written one at a time so memory stays flat for large files
+        f.write('{\n    "Parameters": [\n')
+        for row in range(rows):
+            if row:
+                f.write(",\n")
+            text = json.dumps(generate_record(rng, row), indent=4)
+            f.write("        " + text.replace("\n", "\n        "))
+        f.write("\n    ]\n}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic parameters.json")
+    parser.add_argument("rows", type=int, help="number of Parameters records")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.rows, args.output, args.seed)
+
+
+if __name__ == "__main__":
+    main()
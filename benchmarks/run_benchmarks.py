@@ -0,0 +1,252 @@
+"""Benchmark the editor's file operations on synthetic parameters files.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --output results.json
+    python benchmarks/run_benchmarks.py --sizes 100000 --compare results.json
+
+Runs headless on Qt's offscreen platform. load_file parses the JSON every
+time; load_file_cached reopens the file from the sidecar cache.
+The save operations run the editor's Save, on a copy of the generated
+file: save_file_cold serializes every row, save_file splices rows
+already serialized, and save_file_after_edit edits a different row
+before each save. Each operation is timed on its own, then run again under
+tracemalloc to record its peak Python memory (skip that with
+--no-memory). Results are written as JSON; --compare prints the change
+against an earlier results file and exits with status 1 when an
+operation got slower than --threshold allows.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from PyQt5.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import json_editor  # noqa: E402
+from file_cache import FileCache  # noqa: E402
+from journal import journal_path  # noqa: E402
+from generate_parameters import generate  # noqa: E402
+from parameters_core import COLUMNS, format_value, parse_list  # noqa: E402
+
+# Typed one character at a time, as a user searching for an Id would
+FIND_QUERIES = ["w", "we", "wea", "weap", "weapon_ak", "cal_9", "_1234", "missing_id"]
+
+
+def save_failed(parent, title, text, *args):
+    raise RuntimeError(text)
+
+
+# A save reports how it went in a message box, which would wait for a click
+QMessageBox.information = staticmethod(lambda *args: QMessageBox.Ok)
+QMessageBox.critical = staticmethod(save_failed)
+
+
+class Benchmark:
+    """Sets up an editor on one generated file and runs each operation against it"""
+
+    def __init__(self, app, file_path, work_dir):
+        self.app = app
+        # Saving writes over the open file, so the editor opens a copy and the generated file stays as it was
+        self.file_path = os.path.join(work_dir, "open_" + os.path.basename(file_path))
+        shutil.copyfile(file_path, self.file_path)
+        # Edits are only made to be timed; a journal left by an interrupted run would be offered for replay
+        if os.path.exists(journal_path(self.file_path)):
+            os.remove(journal_path(self.file_path))
+        self.editor = json_editor.JsonEditor()
+        self.cache = FileCache(os.path.join(work_dir, "cache"))
+        # The entry of an earlier run is for the copy as that run last saved it
+        self.cache.discard(self.file_path)
+        # A cache that holds nothing, so load_file always parses the file
+        self.no_cache = FileCache(self.cache.directory, max_bytes=0)
+        # Counts the edits made, so each run of save_file_after_edit changes a different row
+        self.edits = 0
+
+    def wait_for_load(self):
+        while self.editor.loader is not None:
+            self.app.processEvents()
+
+    def settle(self):
+        """Let the threads started by the last operation finish, so they don't slow the next one"""
+        while self.editor.background_threads or self.editor.validation_thread is not None:
+            self.app.processEvents()
+
+    def without_cache(self):
+        self.editor.file_cache = self.no_cache
+
+    def with_cache(self):
+        self.editor.file_cache = self.cache
+        if not os.path.exists(self.cache.entry_path(self.file_path)):
+            # The first load writes the entry
+            self.load_file()
+            self.settle()
+
+    def load_file(self):
+        self.editor.load_file(self.file_path)
+        self.wait_for_load()
+
+    def populate_tree(self):
+        self.editor.populate_tree()
+
+    def filter_items(self):
+        for query in FIND_QUERIES:
+            self.editor.filter_items(query)
+
+    def drop_serialized_rows(self):
+        """Make the next save serialize every row, as if nothing had been saved or prepared yet"""
+        self.editor.model.store.json_cache = None
+
+    def save_file(self):
+        self.editor.save_file()
+
+    def save_file_after_edit(self):
+        model = self.editor.model
+        self.edits += 1
+        # A prime stride spreads the edited rows over the file
+        row = self.edits * 7919 % model.rowCount()
+        model.setData(model.index(row, 3), str(100000 + self.edits))
+        self.editor.save_file()
+
+    def parse_list(self):
+        store = self.editor.model.store
+        column = COLUMNS.index("AllowedLocations")
+        for row in range(len(store)):
+            parse_list(format_value("AllowedLocations", store.get(row, column)))
+
+    def close(self):
+        if self.editor.journal is not None:
+            self.editor.journal.discard()
+        self.editor.close()
+
+    def operations(self):
+        """(name, function, setup) for each operation; setup runs untimed before every run"""
+        return [
+            ("load_file", self.load_file, self.without_cache),
+            ("load_file_cached", self.load_file, self.with_cache),
+            ("populate_tree", self.populate_tree, None),
+            ("filter_items", self.filter_items, None),
+            ("save_file_cold", self.save_file, self.drop_serialized_rows),
+            ("save_file", self.save_file, None),
+            ("save_file_after_edit", self.save_file_after_edit, None),
+            ("parse_list", self.parse_list, None),
+        ]
+
+
+def measure(function, setup, settle, with_memory):
+    if setup:
+        setup()
+    gc.collect()
+    started = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - started
+    settle()
+    peak = None
+    if with_memory:
+        if setup:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        settle()
+    return seconds, peak
+
+
+def run(sizes, repeat, with_memory, work_dir):
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = []
+    for rows in sizes:
+        file_path = os.path.join(work_dir, f"parameters_{rows}.json")
+        if not os.path.exists(file_path):
+            print(f"Generating {rows} rows...", flush=True)
+            generate(rows, file_path)
+        benchmark = Benchmark(app, file_path, work_dir)
+        benchmark.without_cache()
+        for name, function, setup in benchmark.operations():
+            timings = []
+            peak = None
+            for attempt in range(repeat):
+                seconds, attempt_peak = measure(function, setup, benchmark.settle, with_memory and attempt == 0)
+                timings.append(seconds)
+                peak = attempt_peak if attempt == 0 else peak
+            result = {
+                "operation": name,
+                "rows": rows,
+                "seconds": min(timings),
+                "timings": timings,
+                "peak_bytes": peak,
+            }
+            results.append(result)
+            peak_text = f"{peak / 1024 / 1024:9.1f} MB" if peak is not None else ""
+            print(f"{name:<22} {rows:>9} rows {min(timings):10.4f} s {peak_text}", flush=True)
+        benchmark.close()
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print each operation's time against the baseline and return the regressions"""
+    with open(baseline_path, 'r') as f:
+        baseline = {(r["operation"], r["rows"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["operation"], result["rows"]))
+        if not previous or not previous["seconds"]:
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(result)
+        print(f"{result['operation']:<22} {result['rows']:>9} rows "
+              f"{previous['seconds']:10.4f} s -> {result['seconds']:10.4f} s ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parameters editor")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="row counts to benchmark (default: 1000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation; the fastest is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory run")
+    parser.add_argument("--work-dir", help="where to keep generated files (default: a temporary directory)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against an earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown that counts as a regression (default: 0.2 for 20%%)")
+    args = parser.parse_args(argv)
+
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="parameters_bench_"))
+    os.makedirs(work_dir, exist_ok=True)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    # The editor reads and writes settings.json in the current directory
+    os.chdir(work_dir)
+
+    results = run(args.sizes, max(1, args.repeat), not args.no_memory, work_dir)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if baseline:
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
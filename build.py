@@ -6,4 +6,12 @@ PyInstaller.__main__.run([
     '--name=ParametersEditor',  # Name of the executable
     '--onefile',             # Create a single executable file
     '--windowed',            # Hide the console window
-])
\ No newline at end of file
+    # Standard library packages the editor never uses; leaving them out makes
+    # the executable smaller and faster to unpack on every start
+    '--exclude-module=tkinter',
+    '--exclude-module=unittest',
+    '--exclude-module=pydoc',
+])
+
+# Run the built executable with --startup-report to write startup_report.json
+# with the time each startup step took.
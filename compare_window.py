@@ -0,0 +1,300 @@
+"""Side by side comparison of the open file with another parameters file."""
+import os
+
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtWidgets import (QAbstractItemView, QCheckBox, QHBoxLayout, QHeaderView, QLabel,
+                             QMainWindow, QMessageBox, QPushButton, QSizePolicy, QSplitter,
+                             QTableView, QVBoxLayout, QWidget, QFrame)
+from PyQt5.QtCore import Qt, QItemSelection, QItemSelectionModel, QItemSelectionRange
+
+from file_loader import FileLoader
+from parameters_core import COLUMNS, ParameterStore, format_value
+from parameters_diff import ADDED, CHANGED, REMOVED, ParametersDiff, changes_to_match
+from undo import ChangeGroup
+
+# Cell backgrounds for each kind of difference
+CHANGED_COLOR = QtGui.QColor("#6b5b1e")
+ADDED_COLOR = QtGui.QColor("#1e5b2a")
+REMOVED_COLOR = QtGui.QColor("#5b1e1e")
+MISSING_COLOR = QtGui.QColor("#3a3a3a")
+
+
+class DiffSideModel(QtCore.QAbstractTableModel):
+    """One side of a ParametersDiff, showing the entries listed in entries.
+
+    Both sides show the same entries in the same order, so row i of the left
+    table and row i of the right table are always the same pair.
+    """
+
+    def __init__(self, left_side, parent=None):
+        super().__init__(parent)
+        self.left_side = left_side
+        self.diff = None
+        self.entries = []
+
+    def set_diff(self, diff, entries):
+        self.beginResetModel()
+        self.diff = diff
+        self.entries = entries
+        self.endResetModel()
+
+    def store_row(self, row):
+        """The row of this side's store shown at row, or -1 if the Id is only on the other side"""
+        rows = self.diff.left_rows if self.left_side else self.diff.right_rows
+        return rows[self.entries[row]]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        store_row = self.store_row(row)
+        if role == Qt.DisplayRole:
+            if store_row < 0:
+                return None
+            store = self.diff.left if self.left_side else self.diff.right
+            return format_value(COLUMNS[column], store.get(store_row, column))
+        if role == Qt.BackgroundRole:
+            entry = self.entries[row]
+            status = self.diff.status(entry)
+            if store_row < 0:
+                return MISSING_COLOR
+            if status == ADDED:
+                return ADDED_COLOR
+            if status == REMOVED:
+                return REMOVED_COLOR
+            if status == CHANGED and self.diff.masks[entry] & (1 << column):
+                return CHANGED_COLOR
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+class CompareWindow(QMainWindow):
+    """Shows the editor's open file next to another file, matched by Id.
+
+    The diff is recomputed shortly after every edit in the editor. Selected
+    differences can be copied from the other file into the open one as a
+    single undoable change.
+    """
+
+    def __init__(self, editor, file_path):
+        super().__init__(editor)
+        self.editor = editor
+        self.file_path = file_path
+        self.other = None
+        self.diff = None
+        self.loader = None
+        self.syncing = False
+        self.initUI()
+
+        # Recompute once edits pause instead of after every one
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(300)
+        self.refresh_timer.timeout.connect(self.refresh)
+        # Disconnected on the first close; the editor may close the window again
+        self.editor_signals = [editor.model.edited, editor.model.modelReset, editor.model.rowsInserted]
+        for signal in self.editor_signals:
+            signal.connect(self.refresh_timer.start)
+
+        self.load_other()
+
+    def initUI(self):
+        self.setWindowTitle(f"Compare With {os.path.basename(self.file_path)}")
+        self.resize(1400, 800)
+
+        top_frame = QFrame(self)
+        top_layout = QHBoxLayout(top_frame)
+        top_layout.setAlignment(Qt.AlignLeft)
+
+        self.show_same_box = QCheckBox("Show unchanged rows")
+        self.show_same_box.toggled.connect(self.show_entries)
+
+        take_button = QPushButton("Take Selected from Other File")
+        take_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        take_button.clicked.connect(self.take_selected)
+
+        reload_button = QPushButton("Reload Other File")
+        reload_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        reload_button.clicked.connect(self.load_other)
+
+        self.summary_label = QLabel("")
+
+        top_layout.addWidget(self.show_same_box)
+        top_layout.addWidget(take_button)
+        top_layout.addWidget(reload_button)
+        top_layout.addWidget(self.summary_label)
+        top_frame.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
+
+        self.left_model = DiffSideModel(True, self)
+        self.right_model = DiffSideModel(False, self)
+        self.left_table = self.create_table(self.left_model)
+        self.right_table = self.create_table(self.right_model)
+
+        # Keep both tables on the same rows and columns
+        for source, target in ((self.left_table, self.right_table), (self.right_table, self.left_table)):
+            source.verticalScrollBar().valueChanged.connect(target.verticalScrollBar().setValue)
+            source.horizontalScrollBar().valueChanged.connect(target.horizontalScrollBar().setValue)
+            source.selectionModel().selectionChanged.connect(
+                lambda selected, deselected, source=source, target=target: self.sync_selection(source, target))
+        self.left_table.doubleClicked.connect(self.show_in_editor)
+
+        splitter = QSplitter(Qt.Horizontal)
+        for title, table in (("Open file", self.left_table), (self.file_path, self.right_table)):
+            side = QWidget()
+            side_layout = QVBoxLayout(side)
+            side_layout.setContentsMargins(0, 0, 0, 0)
+            side_layout.addWidget(QLabel(title))
+            side_layout.addWidget(table)
+            splitter.addWidget(side)
+
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(top_frame)
+        main_layout.addWidget(splitter)
+        main_layout.setStretch(1, 1)
+
+        central_widget = QFrame()
+        central_widget.setLayout(main_layout)
+        self.setCentralWidget(central_widget)
+
+    def create_table(self, model):
+        table = QTableView()
+        table.setModel(model)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        for column in range(len(COLUMNS)):
+            table.setColumnWidth(column, self.editor.table.columnWidth(column))
+        vertical_header = table.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(self.fontMetrics().height() + 10)
+        table.setShowGrid(False)
+        table.setWordWrap(False)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        return table
+
+    def load_other(self):
+        if self.loader is not None:
+            return
+        self.summary_label.setText(f"Loading {self.file_path}...")
+        self.loader = FileLoader(self.file_path, self)
+        self.loader.loaded.connect(self.on_other_loaded)
+        self.loader.failed.connect(self.on_other_failed)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.loader.start()
+
+    def on_other_loaded(self, document):
+        self.other = self.loader.store
+        self.loader = None
+        self.refresh()
+
+    def on_other_failed(self, message):
+        self.loader = None
+        self.summary_label.setText("")
+        QMessageBox.critical(self, "Error", f"Failed to open file: {message}")
+
+    def refresh(self):
+        """Compare the editor's current rows with the other file"""
+        if self.other is None:
+            return
+        if self.editor.loader is not None:
+            # The open file is still loading; compare once it is complete
+            self.refresh_timer.start()
+            return
+        if not isinstance(self.editor.model.store, ParameterStore):
+            self.diff = None
+            self.summary_label.setText("The open file is memory-mapped and can't be compared")
+            self.left_model.set_diff(None, [])
+            self.right_model.set_diff(None, [])
+            return
+        self.diff = ParametersDiff(self.editor.model.store, self.other)
+        counts = self.diff.counts()
+        self.summary_label.setText(f"{counts[CHANGED]} changed, {counts[REMOVED]} only in open file, "
+                                   f"{counts[ADDED]} only in other file")
+        self.show_entries()
+
+    def show_entries(self):
+        if self.diff is None:
+            return
+        if self.show_same_box.isChecked():
+            entries = range(len(self.diff))
+        else:
+            entries = self.diff.differing()
+        # Keep the view near where it was after a refresh
+        position = self.left_table.verticalScrollBar().value()
+        self.left_model.set_diff(self.diff, entries)
+        self.right_model.set_diff(self.diff, entries)
+        self.left_table.verticalScrollBar().setValue(position)
+
+    def sync_selection(self, source, target):
+        if self.syncing:
+            return
+        self.syncing = True
+        model = target.model()
+        selection = QItemSelection()
+        for selected in source.selectionModel().selection():
+            selection.append(QItemSelectionRange(model.index(selected.top(), selected.left()),
+                                                 model.index(selected.bottom(), selected.right())))
+        target.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+        self.syncing = False
+
+    def selected_entries(self):
+        rows = set()
+        for selected in self.left_table.selectionModel().selection():
+            rows.update(range(selected.top(), selected.bottom() + 1))
+        return [self.left_model.entries[row] for row in sorted(rows)]
+
+    def show_in_editor(self, index):
+        row = self.left_model.store_row(index.row())
+        if row >= 0:
+            row = self.editor.model.view_row(row)
+        if row >= 0:
+            editor_index = self.editor.model.index(row, index.column())
+            self.editor.table.setCurrentIndex(editor_index)
+            self.editor.table.scrollTo(editor_index, QAbstractItemView.PositionAtCenter)
+
+    def take_selected(self):
+        """Make the selected rows of the open file match the other file, as one undo step"""
+        if self.diff is None or self.editor.data is None or self.editor.loader is not None:
+            return
+        if self.refresh_timer.isActive():
+            # The rows shown may no longer match the open file
+            self.refresh_timer.stop()
+            self.refresh()
+            QMessageBox.information(self, "Compare", "The comparison was out of date; check the selection and try again.")
+            return
+        entries = self.selected_entries()
+        if not entries:
+            QMessageBox.information(self, "Compare", "Select the rows to take first.")
+            return
+        changes = changes_to_match(self.diff, entries)
+        if not changes:
+            return
+        self.editor.model.commit(ChangeGroup(changes))
+        self.editor.statusBar().showMessage(
+            f"Took {len(entries)} rows from {os.path.basename(self.file_path)}", 5000)
+
+    def closeEvent(self, event):
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loader.wait()
+        for signal in self.editor_signals:
+            signal.disconnect(self.refresh_timer.start)
+        self.editor_signals = []
+        self.refresh_timer.stop()
+        super().closeEvent(event)
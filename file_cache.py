@@ -0,0 +1,284 @@
+"""Binary cache of decoded Parameters files, for reopening unchanged files at once.
+
+Each cached file gets one entry holding its ParameterStore columns as raw
+arrays, the Ids and the Find ID haystack as text, and everything else (the
+pool, overrides, layouts and the other top-level sections) as JSON. An
+entry is only used while the file still has the size, modification time
+and SHA-256 it was written for; anything else, including a damaged or
+outdated entry, means the file is read normally. Entries are kept up to a
+total size, dropping the least recently used first. Like parameters_core,
+this module does not import PyQt.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from parameters_core import COLUMNS, MISSING, ParameterStore, replace_file
+from search_index import IdIndex
+
+MAGIC = b"PJECACHE"
+VERSION = 1
+SUFFIX = ".pcache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK = 8 * 1024 * 1024
+# Magic, then the length of the JSON header that follows
+_PREFIX = struct.Struct("<8sI")
+# Sections start at multiples of this, so the arrays in them are aligned in the map
+_ALIGN = 8
+
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK)
+    view = memoryview(buffer)
+    with open(file_path, 'rb') as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def stat_signature(file_path):
+    """Size and modification time of file_path, or None if it can't be read"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def join_text(values):
+    """values joined by newlines, and whether splitting on newlines gives them back"""
+    plain = not any("\n" in value for value in values)
+    return "\n".join(values), plain
+
+
+def split_text(text, plain, offsets):
+    if plain:
+        return text.split("\n") if text or offsets else []
+    return [text[start:offsets[index + 1] - 1] if index + 1 < len(offsets) else text[start:]
+            for index, start in enumerate(offsets)]
+
+
+class FileCache:
+    """Cache entries for parameters files, kept in one directory"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, file_path):
+        key = hashlib.sha1(os.path.normcase(os.path.realpath(file_path)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:20] + SUFFIX)
+
+    def load(self, file_path, store):
+        """Fill store, an empty ParameterStore, from file_path's entry and return (document, id_index).
+
+        document has store under "Parameters". Returns None, leaving store
+        empty, when there is no usable entry, so the caller reads the file
+        instead.
+        """
+        if self.max_bytes <= 0:
+            return None
+        path = self.entry_path(file_path)
+        signature = stat_signature(file_path)
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                header = self.read_header(data)
+                if (header.get("path") != os.path.realpath(file_path) or header.get("signature") != signature
+                        or header.get("hash") != file_hash(file_path)):
+                    return None
+                if stat_signature(file_path) != signature:
+                    # Changed while it was being hashed
+                    return None
+                result = self.decode(data, header, store)
+        except (OSError, ValueError, KeyError, TypeError, IndexError, BufferError, struct.error):
+            # Missing, damaged or from another version; it is rewritten after the file is read
+            return None
+        try:
+            # Most recently used, for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    @staticmethod
+    def read_header(data):
+        magic, length = _PREFIX.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a cache entry")
+        header = json.loads(data[_PREFIX.size:_PREFIX.size + length])
+        if header.get("version") != VERSION:
+            raise ValueError("Cache entry from another version")
+        return header
+
+    @staticmethod
+    def decode(data, header, store):
+        """Fill store from the entry in data; store is only changed once all of it has been read"""
+        sections = header["sections"]
+        rows = header["rows"]
+        view = memoryview(data)
+
+        def section(name):
+            start, length = sections[name]
+            if start + length > len(data):
+                raise ValueError("Cache entry is cut short")
+            return view[start:start + length]
+
+        meta = json.loads(str(section("meta"), 'utf-8'))
+        # Decoded into a store of its own, so a damaged entry leaves store as it was
+        decoded = ParameterStore()
+        pool = decoded.pool
+        for value in meta["pool"]:
+            pool.code(sys.intern(value) if isinstance(value, str) else tuple(sys.intern(item) for item in value))
+        columns = decoded.columns
+        for column in range(len(COLUMNS)):
+            if column == 0:
+                offsets = array('q')
+                offsets.frombytes(section("id_offsets"))
+                columns[0] = split_text(str(section("ids"), 'utf-8'), header["ids_plain"], offsets)
+            elif isinstance(columns[column], bytearray):
+                columns[column] = bytearray(section(f"column{column}"))
+            else:
+                columns[column].frombytes(section(f"column{column}"))
+            if len(columns[column]) != rows:
+                raise ValueError("Cache entry has the wrong number of rows")
+        overrides = decoded.overrides
+        for row, column, value, missing in meta["overrides"]:
+            value = MISSING if missing else value
+            overrides[(row, column)] = value
+            if column == 0:
+                columns[0][row] = value
+        layouts = {row: (None if keys is None else tuple(keys), extras) for row, keys, extras in meta["layouts"]}
+        irregular_rows = set(meta["irregular_rows"])
+
+        id_index = IdIndex()
+        offsets = array('q')
+        offsets.frombytes(section("haystack_offsets"))
+        haystack = str(section("haystack"), 'utf-8')
+        id_index.restore(split_text(haystack, header["haystack_plain"], offsets), haystack, offsets)
+        view.release()
+
+        store.pool = pool
+        store.columns = columns
+        store.overrides = overrides
+        store.layouts = layouts
+        store.irregular_rows = irregular_rows
+        document = meta["document"]
+        document["Parameters"] = store
+        return document, id_index
+
+    def save(self, file_path, signature, document, store, pool_values):
+        """Write the entry for file_path, read with the given stat_signature, then evict old entries.
+
+        store must not change while this runs (pass a snapshot); pool_values
+        is its pool as it was when the snapshot was taken. Nothing is written
+        if the file changed since it was read.
+        """
+        if self.max_bytes <= 0 or signature is None:
+            return
+        digest = file_hash(file_path)
+        if stat_signature(file_path) != signature:
+            return
+        sections = []
+        ids = [value if type(value) is str else "" for value in store.ids]
+        text, ids_plain = join_text(ids)
+        sections.append(("ids", text.encode('utf-8')))
+        sections.append(("id_offsets", self.offsets(ids).tobytes()))
+        for column in range(1, len(COLUMNS)):
+            sections.append((f"column{column}", bytes(store.columns[column])))
+        lowered = [str(value).lower() for value in store.ids]
+        haystack, haystack_plain = join_text(lowered)
+        sections.append(("haystack", haystack.encode('utf-8')))
+        sections.append(("haystack_offsets", self.offsets(lowered).tobytes()))
+        meta = {
+            "document": {key: (None if key == "Parameters" else value) for key, value in document.items()},
+            "pool": [value if isinstance(value, str) else list(value) for value in pool_values],
+            "overrides": [[row, column, None if value is MISSING else value, value is MISSING]
+                          for (row, column), value in store.overrides.items()],
+            "layouts": [[row, None if keys is None else list(keys), extras]
+                        for row, (keys, extras) in store.layouts.items()],
+            "irregular_rows": sorted(store.irregular_rows),
+        }
+        sections.append(("meta", json.dumps(meta).encode('utf-8')))
+
+        header = {"version": VERSION, "path": os.path.realpath(file_path), "signature": signature,
+                  "hash": digest, "rows": len(store), "ids_plain": ids_plain,
+                  "haystack_plain": haystack_plain, "sections": {}}
+        # The header holds the section offsets, which depend on the header's length;
+        # reserve room for the offsets and settle them in a second pass
+        for name, blob in sections:
+            header["sections"][name] = [0, len(blob)]
+        for _ in range(2):
+            position = self.aligned(_PREFIX.size + len(json.dumps(header).encode('utf-8')) + 64)
+            for name, blob in sections:
+                header["sections"][name] = [position, len(blob)]
+                position = self.aligned(position + len(blob))
+        total = position
+        if total > self.max_bytes:
+            return
+        header_bytes = json.dumps(header).encode('utf-8')
+
+        def write(f):
+            f.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for name, blob in sections:
+                start = header["sections"][name][0]
+                f.write(b"\0" * (start - f.tell()))
+                f.write(blob)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.entry_path(file_path)
+        replace_file(path, write, binary=True)
+        self.evict(keep=path)
+
+    @staticmethod
+    def offsets(values):
+        """Where each of values starts once they are joined by newlines"""
+        offsets = array('q')
+        position = 0
+        for value in values:
+            offsets.append(position)
+            position += len(value) + 1
+        return offsets
+
+    @staticmethod
+    def aligned(position):
+        return (position + _ALIGN - 1) // _ALIGN * _ALIGN
+
+    def evict(self, keep=None):
+        """Delete the least recently used entries until they fit in max_bytes"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path == keep, stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, _, size, _ in entries)
+        for _, _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def discard(self, file_path):
+        try:
+            os.remove(self.entry_path(file_path))
+        except OSError:
+            pass
@@ -0,0 +1,117 @@
+"""Background loading of parameters files."""
+import os
+
+from PyQt5 import QtCore
+
+from parameters_core import DocumentReader, ParameterStore
+
+
+class FileLoader(QtCore.QThread):
+    """Read and decode a parameters file off the GUI thread.
+
+    Decoded records are converted straight into store on this thread, and
+    rows_loaded reports how many rows are ready so the table fills in while
+    the rest of the file is still being decoded. Call requestInterruption()
+    to cancel; the thread then stops at the next batch and emits cancelled
+    instead of loaded.
+
+    With mapped set, the file is memory-mapped into a MappedParameterStore
+    instead, which only scans for where each record is.
+
+    Given a FileCache, an unchanged file is read from its cache entry
+    instead, which also gives id_index, the Find ID index, ready built.
+    signature is the file's size and modification time as it was read.
+    """
+    rows_loaded = QtCore.pyqtSignal(int)
+    progress = QtCore.pyqtSignal(int)
+    loaded = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+
+    # Reading is reported as the first part of the progress bar, decoding as the rest
+    READ_SHARE = 20
+    READ_CHUNK = 4 * 1024 * 1024
+
+    def __init__(self, file_path, parent=None, mapped=False, cache=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.mapped = mapped
+        self.cache = cache
+        if mapped:
+            # Imported here, like the cache below; the window starts without either
+            from mapped_store import MappedParameterStore
+            self.store = MappedParameterStore(file_path)
+        else:
+            self.store = ParameterStore()
+        self.signature = None
+        self.id_index = None
+        self.from_cache = False
+
+    def run(self):
+        if self.mapped:
+            self.run_mapped()
+            return
+        from file_cache import stat_signature
+        self.signature = stat_signature(self.file_path)
+        if self.cache is not None and self.run_cached():
+            return
+        try:
+            total = max(os.path.getsize(self.file_path), 1)
+            chunks = []
+            read = 0
+            with open(self.file_path, 'r') as f:
+                while True:
+                    if self.isInterruptionRequested():
+                        self.cancelled.emit()
+                        return
+                    chunk = f.read(self.READ_CHUNK)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    read += len(chunk)
+                    self.progress.emit(min(self.READ_SHARE, self.READ_SHARE * read // total))
+            text = ''.join(chunks)
+            del chunks
+
+            reader = DocumentReader(text)
+            decode_share = 100 - self.READ_SHARE
+            length = max(len(text), 1)
+            for batch in reader.batches():
+                if self.isInterruptionRequested():
+                    self.cancelled.emit()
+                    return
+                self.store.extend(batch)
+                self.rows_loaded.emit(len(self.store))
+                self.progress.emit(self.READ_SHARE + decode_share * reader.position // length)
+            self.progress.emit(100)
+            self.loaded.emit(reader.document)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def run_cached(self):
+        """Load the file from its cache entry; False if it has no usable one"""
+        cached = self.cache.load(self.file_path, self.store)
+        if cached is None:
+            return False
+        document, self.id_index = cached
+        self.from_cache = True
+        self.rows_loaded.emit(len(self.store))
+        self.progress.emit(100)
+        self.loaded.emit(document)
+        return True
+
+    def run_mapped(self):
+        store = self.store
+        try:
+            for count in store.scan():
+                if self.isInterruptionRequested():
+                    store.close()
+                    self.cancelled.emit()
+                    return
+                self.rows_loaded.emit(count)
+                self.progress.emit(100 * store.position // max(store.size, 1))
+            self.progress.emit(100)
+            self.loaded.emit(store.document)
+        except Exception as e:
+            store.close()
+            self.failed.emit(str(e))
@@ -0,0 +1,104 @@
+"""Notice when another program rewrites the open file and re-read it in the background."""
+import os
+
+from PyQt5 import QtCore
+
+from file_loader import FileLoader
+
+
+class FileWatcher(QtCore.QObject):
+    """Watches one file and emits reloaded with its new contents after it changes.
+
+    Bursts of change notifications are collapsed into one check once the
+    file has been quiet for DELAY ms. The file is only re-read when its
+    modification time or size differs from what was last seen, so the
+    editor's own saves are skipped as long as it calls remember() after
+    writing. Reading and parsing run on a FileLoader thread.
+    """
+    reloaded = QtCore.pyqtSignal(object, object)
+    failed = QtCore.pyqtSignal(str)
+
+    DELAY = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file_path = None
+        self.signature = None
+        self.loader = None
+        self.pending = False
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY)
+        self.timer.timeout.connect(self.check)
+        self.watcher.fileChanged.connect(self.timer.start)
+
+    def watch(self, file_path):
+        """Start watching file_path as it is now, replacing any earlier file"""
+        self.stop()
+        self.file_path = file_path
+        self.watcher.addPath(file_path)
+        self.remember()
+
+    def stop(self):
+        self.timer.stop()
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loader.wait()
+            self.loader = None
+        self.file_path = None
+        self.pending = False
+
+    def remember(self):
+        """Treat the file as it is now as already read"""
+        self.signature = self.stat()
+
+    def stat(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        if self.file_path is None:
+            return
+        # Saving through a temporary file replaces the file, which drops it from the watcher
+        if self.file_path not in self.watcher.files() and os.path.exists(self.file_path):
+            self.watcher.addPath(self.file_path)
+        signature = self.stat()
+        if signature is None or signature == self.signature:
+            return
+        if self.loader is not None:
+            # Read again once the current read is done
+            self.pending = True
+            return
+        self.signature = signature
+        self.loader = FileLoader(self.file_path, self)
+        self.loader.loaded.connect(self.on_loaded)
+        self.loader.failed.connect(self.on_failed)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.loader.start()
+
+    def on_loaded(self, document):
+        if self.sender() is not self.loader:
+            return
+        store = self.loader.store
+        self.loader = None
+        self.reloaded.emit(document, store)
+        self.check_pending()
+
+    def on_failed(self, message):
+        if self.sender() is not self.loader:
+            return
+        self.loader = None
+        # A half-written file fails to parse; the write that completes it triggers another check
+        self.failed.emit(message)
+        self.check_pending()
+
+    def check_pending(self):
+        if self.pending:
+            self.pending = False
+            self.check()
@@ -0,0 +1,178 @@
+"""Append-only journal of the edits made to an open file, for crash recovery.
+
+Every change applied to the rows (undo and redo included, as the changes
+they apply) is appended to PATH.journal as one JSON line, so the journal
+only ever grows by the size of the edit rather than the file. The first
+line records the size and modification time of the file the edits were
+made to; replaying onto a file that has changed since would put values in
+the wrong rows. The journal is deleted once the file is saved. Like
+parameters_core, this module does not import PyQt.
+"""
+import json
+import os
+import time
+
+from parameters_core import COLUMNS, LIST_COLUMNS, MISSING
+from undo import Change, ChangeGroup, RowsInserted, RowsRemoved
+
+JOURNAL_SUFFIX = ".journal"
+VERSION = 1
+
+
+def journal_path(file_path):
+    return file_path + JOURNAL_SUFFIX
+
+
+def file_signature(file_path):
+    """Modification time and size of file_path, or None if it can't be read"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def encode_values(values):
+    """Values as JSON, with the positions of MISSING values listed separately"""
+    missing = [position for position, value in enumerate(values) if value is MISSING]
+    if missing:
+        values = [None if value is MISSING else value for value in values]
+    return values, missing
+
+
+def decode_values(column, values, missing):
+    if COLUMNS[column] in LIST_COLUMNS:
+        # Lists of strings are tuples in the store
+        values = [tuple(value) if type(value) is list and all(type(item) is str for item in value) else value
+                  for value in values]
+    for position in missing:
+        values[position] = MISSING
+    return values
+
+
+def encode_changes(change):
+    """Yield one JSON-ready entry per Change, RowsInserted or RowsRemoved in change"""
+    if isinstance(change, ChangeGroup):
+        for part in change.changes:
+            yield from encode_changes(part)
+    elif isinstance(change, Change):
+        old, old_missing = encode_values(change.old)
+        new, new_missing = encode_values([change.new] if change.uniform else change.new)
+        entry = {"column": change.column, "rows": change.rows.tolist(), "old": old, "new": new}
+        if change.uniform:
+            entry["uniform"] = True
+        if old_missing:
+            entry["old_missing"] = old_missing
+        if new_missing:
+            entry["new_missing"] = new_missing
+        yield entry
+    else:
+        kind = "remove" if isinstance(change, RowsRemoved) else "insert"
+        yield {kind: change.positions, "records": change.records}
+
+
+def decode_change(entry):
+    if "column" in entry:
+        column = entry["column"]
+        old = decode_values(column, entry["old"], entry.get("old_missing", ()))
+        new = decode_values(column, entry["new"], entry.get("new_missing", ()))
+        if entry.get("uniform"):
+            new = new * len(entry["rows"])
+        return Change(column, entry["rows"], old, new)
+    if "remove" in entry:
+        return RowsRemoved(entry["remove"], entry["records"])
+    return RowsInserted(entry["insert"], entry["records"])
+
+
+def read_journal(file_path):
+    """Return the header of file_path's journal and the changes in it, in order.
+
+    A last line cut short by a crash is ignored. Raises OSError if there is
+    no journal and ValueError if it can't be read.
+    """
+    with open(journal_path(file_path), 'r', encoding='utf-8') as f:
+        lines = f.read().split("\n")
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        raise ValueError("The journal has no valid header")
+    if not isinstance(header, dict) or header.get("journal") != VERSION:
+        raise ValueError("Unknown journal version")
+    changes = []
+    entries = [line for line in lines[1:] if line]
+    for number, line in enumerate(entries):
+        try:
+            changes.append(decode_change(json.loads(line)))
+        except (ValueError, KeyError, TypeError, IndexError):
+            if number == len(entries) - 1:
+                # Cut short by a crash while it was being written
+                break
+            raise ValueError(f"The journal is damaged after {number} changes")
+    return header, changes
+
+
+def changes_fit(changes, row_count):
+    """Whether changes only touch rows that exist in a file of row_count rows as they are applied"""
+    for change in changes:
+        if isinstance(change, Change):
+            if change.rows and (min(change.rows) < 0 or max(change.rows) >= row_count):
+                return False
+        elif isinstance(change, RowsRemoved):
+            if change.positions and max(change.positions) >= row_count:
+                return False
+            row_count -= len(change.positions)
+        else:
+            row_count += len(change.positions)
+            if change.positions and max(change.positions) >= row_count:
+                return False
+    return True
+
+
+class Journal:
+    """Appends the changes made to one file to its journal.
+
+    The journal file is created on the first change. Lines are written as
+    changes come in but only forced to disk by sync(), which the caller runs
+    on a timer so a burst of edits costs one fsync.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.path = journal_path(file_path)
+        self.signature = file_signature(file_path)
+        self.file = None
+        self.started = False
+        self.unsynced = False
+
+    def append(self, change):
+        if self.file is None and self.started:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        elif self.file is None:
+            self.file = open(self.path, 'w', encoding='utf-8')
+            self.started = True
+            header = {"journal": VERSION, "file": os.path.basename(self.file_path),
+                      "signature": self.signature, "started": time.strftime("%Y-%m-%d %H:%M:%S")}
+            self.file.write(json.dumps(header) + "\n")
+        self.file.write("".join(json.dumps(entry) + "\n" for entry in encode_changes(change)))
+        self.unsynced = True
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+
+    def close(self):
+        """Stop writing, leaving the journal for the next session to recover"""
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        """Delete the journal, once its edits are safely in the file"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
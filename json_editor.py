@@ -1,32 +1,479 @@
+import time
+STARTED = time.perf_counter()
+
 import json
 import sys
 import os
+from array import array
+from bisect import bisect_left, bisect_right
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QMenuBar, QMenu, QAction, 
-                           QFrame, QTreeWidget, QTreeWidgetItem, QHeaderView,
+                           QFrame, QTableView, QHeaderView,
                            QFileDialog, QMessageBox, QHBoxLayout, QVBoxLayout,
-                           QLabel, QLineEdit, QPushButton, QScrollArea, QSizePolicy, QTextEdit, QAbstractItemView)
-from PyQt5.QtCore import Qt
+                           QLabel, QLineEdit, QPushButton, QProgressBar, QSizePolicy, QAbstractItemView)
+from PyQt5.QtCore import Qt, QItemSelection, QItemSelectionModel, QItemSelectionRange
+
+from file_loader import FileLoader
+from file_watcher import FileWatcher
+from journal import Journal, changes_fit, file_signature, journal_path, read_journal
+from parameters_core import (COLUMNS, OPERATIONS, ParameterStore, apply_operation,
+                             format_value, parse_value, save_document)
+from perf import NULL_MEASUREMENT, format_entry, monitor
+from search_index import IdIndex
+from undo import Change, ChangeGroup, RowsInserted, RowsRemoved, UndoHistory, apply_to_store
+
+STARTUP_REPORT_OPTION = "--startup-report"
+# Rolling log written while Performance > Write Performance Log is checked
+PERFORMANCE_LOG_FILE = "performance_log.jsonl"
+# Files at least this large are memory-mapped when that option is on
+MEMORY_MAP_THRESHOLD = 256 * 1024 * 1024
+# Decoded files are cached here, next to settings.json, for reopening unchanged files at once
+CACHE_DIRECTORY = "cache"
+# Background of rows changed both in the editor and by another program
+CONFLICT_COLOR = QtGui.QColor("#7a4a12")
+# Background of cells that fail validation
+INVALID_COLOR = QtGui.QColor("#7a1e2e")
+# Change groups with more parts than this are applied with one model reset
+GROUP_SIGNAL_LIMIT = 100
+# Journaled edits are forced to disk at most this many milliseconds after they are made
+JOURNAL_SYNC_DELAY = 1000
+
+
+def is_mapped(store):
+    """Whether store is a MappedParameterStore.
+
+    mapped_store is only imported once a file is memory-mapped; until
+    then no store can be one, so it isn't imported just to check.
+    """
+    mapped_store = sys.modules.get("mapped_store")
+    return mapped_store is not None and isinstance(store, mapped_store.MappedParameterStore)
+
+
+class StartupReport:
+    """Records how long each startup step took, measured from the first line of this module.
+
+    Enabled by running with --startup-report [PATH]; the report is written as
+    JSON to PATH (default startup_report.json) once the last file has loaded,
+    or straight away when there is no file to load. Works the same in the
+    PyInstaller build, which has no console to print to.
+    """
+
+    def __init__(self, argv):
+        self.path = None
+        self.steps = []
+        self.written = False
+        if STARTUP_REPORT_OPTION in argv:
+            position = argv.index(STARTUP_REPORT_OPTION)
+            following = argv[position + 1] if position + 1 < len(argv) else ""
+            self.path = following if following and not following.startswith("-") else "startup_report.json"
+
+    def mark(self, step):
+        if self.path:
+            self.steps.append((step, time.perf_counter() - STARTED))
+
+    def write(self):
+        if not self.path or self.written:
+            return
+        self.written = True
+        report = {
+            "frozen": getattr(sys, 'frozen', False),
+            "steps": [{"step": step, "seconds": round(seconds, 4)} for step, seconds in self.steps],
+        }
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(report, f, indent=4)
+        except Exception as e:
+            print(f"Failed to write startup report: {e}")
+
+
+startup_report = StartupReport(sys.argv)
+startup_report.mark("imports")
+
+
+class ParametersModel(QtCore.QAbstractTableModel):
+    """Table model backed directly by a ParameterStore.
+
+    Cell text is only produced when the view asks for it, so the cost of
+    opening a file no longer grows with the number of formatted cells.
+    While a file is loading, row_count trails the store and grows as the
+    loader reports new rows.
+
+    Every edit is recorded in history as a Change and announced through
+    edited, which carries the change just applied (already inverted for an
+    undo). Rows whose Id is in conflict_ids are highlighted.
+
+    A query and a sort column narrow and reorder the rows shown. view_rows
+    then lists the store row behind each table row; use store_row() and
+    view_row() to translate, since changes and search results refer to
+    store rows. The view keeps its rows when cells are edited and is only
+    worked out again when the query, the sort or the set of rows changes.
+
+    Cells with a problem in validation are highlighted and carry the
+    problem as their tooltip.
+    """
+    edited = QtCore.pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = ParameterStore()
+        self.row_count = 0
+        self.id_index = IdIndex()
+        self.history = UndoHistory()
+        self.conflict_ids = set()
+        # Set by the editor when a file is opened
+        self.validation = None
+        # Built on first use by query_indexes()
+        self.indexes = None
+        self.query = None
+        self.sort_column = -1
+        self.sort_order = Qt.AscendingOrder
+        self.view_rows = None
+        self.view_positions = None
+
+    def set_store(self, store, row_count=None):
+        self.beginResetModel()
+        self.store = store
+        self.history.clear()
+        self.conflict_ids = set()
+        self.indexes = None
+        self.query = None
+        self.sort_column = -1
+        self.set_view_rows(None)
+        self.row_count = len(store) if row_count is None else row_count
+        self.id_index.set_ids(store.ids[:self.row_count])
+        self.endResetModel()
+
+    def rows_loaded(self, count, id_index=None):
+        """Show the rows the loader has added to the store since the last call.
+
+        id_index, an IdIndex of every row already built (as read from the
+        file cache), is taken instead of indexing the new rows.
+        """
+        first = self.row_count
+        if count <= first:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), first, count - 1)
+        self.row_count = count
+        if id_index is not None and not first and len(id_index) == count:
+            self.id_index.restore(id_index.ids, id_index.haystack, id_index.offsets)
+        else:
+            self.id_index.extend(self.store.ids[first:count])
+        self.endInsertRows()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.row_count if self.view_rows is None else len(self.view_rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row() if self.view_rows is None else self.view_rows[index.row()]
+        column = index.column()
+        if role == Qt.BackgroundRole:
+            if self.validation.message(row, column):
+                return INVALID_COLOR
+            if self.conflict_ids and self.store.ids[row] in self.conflict_ids:
+                return CONFLICT_COLOR
+            return None
+        if role == Qt.ToolTipRole:
+            return self.validation.message(row, column)
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        return format_value(COLUMNS[column], self.store.get(row, column))
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row, column = self.store_row(index.row()), index.column()
+        try:
+            new = parse_value(COLUMNS[column], value)
+        except ValueError:
+            return False
+        self.bulk_update([row], column, lambda current: new)
+        return True
+
+    def bulk_update(self, rows, column, function):
+        """Apply function to the column value of every row as one model change.
+
+        Returns the rows that changed. The view is told about them with a
+        single dataChanged covering the changed range, not one signal per cell.
+        """
+        old = []
+        changed = apply_operation(self.store, rows, column, function, old)
+        if changed:
+            change = Change(column, changed, old, [self.store.get(row, column) for row in changed])
+            self.history.record(change)
+            self.changes_applied(change)
+        return changed
+
+    def commit(self, change):
+        """Apply a change built by the caller and record it as one undo step"""
+        self.apply_change(change)
+        self.history.record(change)
+
+    def set_conflicts(self, ids):
+        """Highlight the rows with these Ids, replacing any earlier highlight"""
+        if not ids and not self.conflict_ids:
+            return
+        self.conflict_ids = set(ids)
+        self.highlights_changed()
+
+    def highlights_changed(self):
+        """Repaint the backgrounds after the conflicts or the validation results changed"""
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, len(COLUMNS) - 1),
+                                  [Qt.BackgroundRole, Qt.ToolTipRole])
+
+    def apply_change(self, change):
+        """Apply change to the store without recording it"""
+        if isinstance(change, ChangeGroup) and len(change.changes) <= GROUP_SIGNAL_LIMIT:
+            for part in change.changes:
+                self.apply_change(part)
+            return
+        if isinstance(change, Change):
+            self.store_change(change)
+            self.changes_applied(change)
+            return
+        # Rows added or removed, or a group too large to signal part by part
+        # (such as a replayed journal): the view is rebuilt once
+        self.beginResetModel()
+        self.store_change(change)
+        self.row_count = len(self.store)
+        self.id_index.set_ids(self.store.ids)
+        if self.indexes is not None:
+            self.indexes.invalidate()
+        self.set_view_rows(self.filtered_sorted_rows())
+        self.endResetModel()
+        self.edited.emit(change)
+
+    def store_change(self, change):
+        """Apply change to the store alone, without telling the view"""
+        apply_to_store(self.store, change)
+
+    def changes_applied(self, change):
+        column = change.column
+        if column == 0:
+            for row in change.rows:
+                self.id_index.update(row, self.store.get(row, column))
+        if self.indexes is not None:
+            self.indexes.invalidate(column)
+        if self.view_rows is None:
+            first, last = min(change.rows), max(change.rows)
+        else:
+            first, last = 0, len(self.view_rows) - 1
+        if last >= 0:
+            self.dataChanged.emit(self.index(first, column), self.index(last, column),
+                                  [Qt.DisplayRole, Qt.EditRole])
+        self.edited.emit(change)
+
+    def set_view_rows(self, rows):
+        self.view_rows = None if rows is None else array('q', rows)
+        self.view_positions = None
+
+    def filtered_sorted_rows(self):
+        """The store rows to show for the current query and sort, or None for all of them in order"""
+        if self.query is None and self.sort_column < 0:
+            return None
+        # Imported here; the window starts without queries or sorting
+        from query import sorted_rows
+        indexes = self.query_indexes()
+        rows = self.query.rows(indexes) if self.query is not None else None
+        if self.sort_column >= 0:
+            rows = sorted_rows(indexes, self.sort_column, rows, self.sort_order == Qt.DescendingOrder)
+        return rows
+
+    def query_indexes(self):
+        """The column indexes of the store for queries and sorting, built on first use"""
+        if self.indexes is None:
+            from query import QueryIndexes
+            self.indexes = QueryIndexes(self.store, self.id_index)
+        return self.indexes
+
+    def update_view(self):
+        self.beginResetModel()
+        self.set_view_rows(self.filtered_sorted_rows())
+        self.endResetModel()
+
+    def set_query(self, query):
+        """Show only the rows matching query, a compiled Query, or every row for None"""
+        with monitor.measure("query") as measurement:
+            self.query = query
+            self.update_view()
+            measurement.rows = self.rowCount()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # Sorting waits until the whole file has loaded
+        if self.row_count != len(self.store):
+            return
+        with monitor.measure("sort") as measurement:
+            self.sort_column = column
+            self.sort_order = order
+            self.update_view()
+            measurement.rows = self.rowCount()
+
+    def store_row(self, row):
+        return row if self.view_rows is None else self.view_rows[row]
+
+    def view_row(self, row):
+        """The table row showing store row, or -1 if the query hides it"""
+        if self.view_rows is None:
+            return row
+        if self.view_positions is None:
+            positions = array('q', [-1]) * len(self.store)
+            for position, store_row in enumerate(self.view_rows):
+                positions[store_row] = position
+            self.view_positions = positions
+        return self.view_positions[row]
+
+    def view_rows_for(self, rows):
+        """Table rows, in table order, for the store rows that are shown"""
+        if self.view_rows is None:
+            return rows
+        return sorted(position for position in map(self.view_row, rows) if position >= 0)
+
+    def undo(self):
+        change = self.history.undo()
+        if change is None:
+            return None
+        inverse = change.inverted()
+        self.apply_change(inverse)
+        return inverse
+
+    def redo(self):
+        change = self.history.redo()
+        if change is not None:
+            self.apply_change(change)
+        return change
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+class ValidationThread(QtCore.QThread):
+    """Runs a full Validation check of a store off the GUI thread"""
+    checked = QtCore.pyqtSignal(object)
+
+    def __init__(self, validation, store, parent=None):
+        super().__init__(parent)
+        self.validation = validation
+        self.store = store
+
+    def run(self):
+        self.checked.emit(self.validation.run(self.store))
+
+
+class CacheWriter(QtCore.QThread):
+    """Writes a FileCache entry off the GUI thread; the cache is optional, so failures are ignored"""
+
+    def __init__(self, cache, file_path, signature, document, store, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.file_path = file_path
+        self.signature = signature
+        # Copies, so edits made meanwhile don't change what is written
+        self.document = dict(document)
+        self.store = store
+        self.pool_values = list(store.pool.values)
+
+    def run(self):
+        try:
+            self.cache.save(self.file_path, self.signature, self.document, self.store, self.pool_values)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Failed to cache {self.file_path}: {e}")
+
+
+class JsonCacheBuilder(QtCore.QThread):
+    """Serializes the rows of a snapshot off the GUI thread (see ParameterStore.begin_json_cache)"""
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+
+    def run(self):
+        self.store.build_json_cache()
+
 
 class JsonEditor(QMainWindow):
+    # Entries recorded by the perf monitor, which may be measured on another thread
+    timing_recorded = QtCore.pyqtSignal(object)
+
     def __init__(self):
         self.settings_file = "settings.json"
         super().__init__()
         self.initUI()
         self.data = None
         self.current_file_path = None
+        self.loader = None
+        self.load_measurement = NULL_MEASUREMENT
+        # The Parameters rows as last read from or written to disk, to tell
+        # changes made by other programs apart from edits made here
+        self.base_store = None
+        self.file_watcher = FileWatcher(self)
+        self.file_watcher.reloaded.connect(self.on_file_changed_on_disk)
+        self.file_watcher.failed.connect(
+            lambda message: self.statusBar().showMessage(f"Could not read the changed file: {message}", 5000))
+        self.compare_window = None
+        self.tree_window = None
+        # Every edit since the file was last loaded or saved, for recovery after a crash
+        self.journal = None
+        self.journal_timer = QtCore.QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(JOURNAL_SYNC_DELAY)
+        self.journal_timer.timeout.connect(self.sync_journal)
+        self.model.edited.connect(self.journal_change)
+        # Edits made while the file was still loading, which the rows as read from it don't have
+        self.load_edits = []
+        self.model.edited.connect(self.note_load_edit)
+        # A full validation pass in progress, the store it checks, and the
+        # rows edited while it runs, checked again once it is done
+        self.validation_thread = None
+        self.validation_store = None
+        self.validation_pending = set()
+        self.validation_rerun = False
+        self.known_cooldown_groups = []
+        self.undo_memory_mb = 64
+        self.cache_size_mb = 512
+        # CacheWriter and JsonCacheBuilder threads still running
+        self.background_threads = []
+        self.shown = False
         self.load_settings()
+        self.model.history.set_max_bytes(self.undo_memory_mb * 1024 * 1024)
+        # Created by get_file_cache() when a file is first opened
+        self.file_cache = None
         self.filtered_items = []
         self.current_filtered_index = -1
-        
-        # Load last opened file if exists and is valid
-        if hasattr(self, 'last_file_path') and self.last_file_path:
+        startup_report.mark("window_created")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.shown:
+            self.shown = True
+            # Open the last file once the event loop is running and the window has painted
+            QtCore.QTimer.singleShot(0, self.load_last_file)
+
+    def load_last_file(self):
+        startup_report.mark("event_loop_started")
+        # Load last opened file if exists and is valid, unless a file was opened in the meantime
+        if self.loader is None and self.data is None and hasattr(self, 'last_file_path') and self.last_file_path:
             if os.path.exists(self.last_file_path):
                 self.load_file(self.last_file_path)
+                return
             else:
                 # File doesn't exist, clear the last file path
                 self.last_file_path = None
                 self.save_settings()
+        startup_report.write()
 
     def initUI(self):
         self.setWindowTitle("SCUM parameters.json Editor")
@@ -51,6 +498,80 @@ class JsonEditor(QMainWindow):
         save_as_action = QAction('Save As...', self)
         save_as_action.triggered.connect(self.save_as_file)
         file_menu.addAction(save_as_action)
+        
+        file_menu.addSeparator()
+        
+        compare_action = QAction('Compare With...', self)
+        compare_action.triggered.connect(self.compare_file)
+        file_menu.addAction(compare_action)
+
+        tree_action = QAction('Open as JSON Tree...', self)
+        tree_action.setToolTip("Browse any JSON file, whatever its layout, without loading it into the table")
+        tree_action.triggered.connect(self.open_tree)
+        file_menu.addAction(tree_action)
+        
+        file_menu.addSeparator()
+        
+        self.memory_map_action = QAction(f'Memory-Map Files over {MEMORY_MAP_THRESHOLD // 1024 // 1024} MB', self)
+        self.memory_map_action.setCheckable(True)
+        self.memory_map_action.setToolTip("Open large files without decoding them; rows are read as they are shown "
+                                          "and saving rewrites only edited rows. Queries, sorting, comparing and "
+                                          "merging changes made on disk need the file loaded normally.")
+        file_menu.addAction(self.memory_map_action)
+        
+        edit_menu = menubar.addMenu('Edit')
+        
+        self.undo_action = QAction('Undo', self)
+        self.undo_action.setShortcut(QtGui.QKeySequence.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        edit_menu.addAction(self.undo_action)
+        
+        self.redo_action = QAction('Redo', self)
+        self.redo_action.setShortcut(QtGui.QKeySequence.Redo)
+        self.redo_action.triggered.connect(self.redo)
+        edit_menu.addAction(self.redo_action)
+        
+        edit_menu.addSeparator()
+        
+        select_matches_action = QAction('Select All Matches', self)
+        select_matches_action.triggered.connect(self.select_all_matches)
+        edit_menu.addAction(select_matches_action)
+        
+        bulk_edit_action = QAction('Bulk Edit Selected Rows...', self)
+        bulk_edit_action.setShortcut('Ctrl+B')
+        bulk_edit_action.triggered.connect(self.bulk_edit)
+        edit_menu.addAction(bulk_edit_action)
+        
+        edit_menu.addSeparator()
+        
+        next_problem_action = QAction('Next Problem', self)
+        next_problem_action.setShortcut('F8')
+        next_problem_action.triggered.connect(lambda: self.next_problem())
+        edit_menu.addAction(next_problem_action)
+        
+        previous_problem_action = QAction('Previous Problem', self)
+        previous_problem_action.setShortcut('Shift+F8')
+        previous_problem_action.triggered.connect(lambda: self.next_problem(backwards=True))
+        edit_menu.addAction(previous_problem_action)
+
+        performance_menu = menubar.addMenu('Performance')
+        
+        self.show_timings_action = QAction('Show Timings in Status Bar', self)
+        self.show_timings_action.setCheckable(True)
+        self.show_timings_action.toggled.connect(self.update_performance_monitor)
+        performance_menu.addAction(self.show_timings_action)
+        
+        self.performance_log_action = QAction(f'Write Performance Log ({PERFORMANCE_LOG_FILE})', self)
+        self.performance_log_action.setCheckable(True)
+        self.performance_log_action.toggled.connect(self.update_performance_monitor)
+        performance_menu.addAction(self.performance_log_action)
+        
+        performance_menu.addSeparator()
+        
+        self.profile_action = QAction('Profile with cProfile', self)
+        self.profile_action.setCheckable(True)
+        self.profile_action.toggled.connect(self.toggle_profiling)
+        performance_menu.addAction(self.profile_action)
 
         # Create filter frame
         filter_frame = QFrame(self)
@@ -65,7 +586,12 @@ class JsonEditor(QMainWindow):
         self.filter_input.setMinimumWidth(200)  # Set minimum width
         self.filter_input.setMaximumWidth(200)  # Set maximum width
         self.filter_input.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        self.filter_input.textChanged.connect(self.filter_items)
+        # Search once typing pauses instead of on every keystroke
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(lambda: self.filter_items(self.filter_input.text()))
+        self.filter_input.textChanged.connect(self.filter_timer.start)
         
         prev_button = QPushButton("Previous")
         prev_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
@@ -75,6 +601,10 @@ class JsonEditor(QMainWindow):
         next_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         next_button.clicked.connect(self.next_match)
         
+        select_all_button = QPushButton("Select All")
+        select_all_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        select_all_button.clicked.connect(self.select_all_matches)
+        
         self.counter_label = QLabel("0/0")
         self.counter_label.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         
@@ -82,63 +612,123 @@ class JsonEditor(QMainWindow):
         filter_layout.addWidget(self.filter_input)
         filter_layout.addWidget(prev_button)
         filter_layout.addWidget(next_button)
+        filter_layout.addWidget(select_all_button)
         filter_layout.addWidget(self.counter_label)
         
         # Set minimum size for filter frame and make it not stretch
         filter_frame.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
         filter_frame.setFixedHeight(50)  # Set fixed height to prevent resizing
         
-        # Create treeview
-        tree_frame = QFrame(self)
-        tree_layout = QVBoxLayout(tree_frame)
-        
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels([
-            "Id", "IsDisabledForSpawning", "AllowedLocations",
-            "CooldownPerSquadMemberMin", "CooldownPerSquadMemberMax",
-            "CooldownGroup", "Variations", "ShouldOverrideInitialAndRandomUsage",
-            "InitialUsageOverride", "RandomUsageOverrideUsage"
-        ])
+        # Create query frame
+        query_frame = QFrame(self)
+        query_frame.setFrameShape(QFrame.StyledPanel)
+        query_frame.setFrameShadow(QFrame.Raised)
+        query_layout = QHBoxLayout(query_frame)
+        
+        query_label = QLabel("Query:")
+        self.query_input = QLineEdit()
+        self.query_input.setPlaceholderText(
+            "e.g. CooldownGroup = Ammo and CooldownPerSquadMemberMin > 30 and AllowedLocations contains Coastal")
+        self.query_input.returnPressed.connect(self.apply_query)
+        
+        apply_query_button = QPushButton("Apply")
+        apply_query_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        apply_query_button.clicked.connect(self.apply_query)
+        
+        clear_query_button = QPushButton("Clear")
+        clear_query_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        clear_query_button.clicked.connect(self.clear_query)
+        
+        self.query_count_label = QLabel("")
+        self.query_count_label.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        
+        query_layout.addWidget(query_label)
+        query_layout.addWidget(self.query_input)
+        query_layout.addWidget(apply_query_button)
+        query_layout.addWidget(clear_query_button)
+        query_layout.addWidget(self.query_count_label)
+        
+        query_frame.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
+        query_frame.setFixedHeight(50)
+        
+        # Create table view
+        table_frame = QFrame(self)
+        table_layout = QVBoxLayout(table_frame)
+        
+        self.model = ParametersModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
     
         # Set column widths
         column_widths = [250, 60, 210, 180, 180, 200, 258, 220, 120, 180]
         for i, width in enumerate(column_widths):
-            self.tree.setColumnWidth(i, width)
+            self.table.setColumnWidth(i, width)
         
         # Set header options
-        header = self.tree.header()
+        header = self.table.horizontalHeader()
         header.setStretchLastSection(True)
         header.setSectionResizeMode(QHeaderView.Interactive)
         
-        # Fix: Set tree widget properties to prevent selection shift
-        self.tree.setFrameStyle(QFrame.NoFrame)  # Remove frame to prevent padding
-        self.tree.setIndentation(0)  # Remove indentation
-        self.tree.setRootIsDecorated(False)  # Remove tree decoration
-        self.tree.setUniformRowHeights(True)  # Ensure consistent row heights
+        # Fixed row heights let the view skip measuring rows it does not paint
+        vertical_header = self.table.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(self.fontMetrics().height() + 10)
         
-        # Create scroll area for tree
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setWidget(self.tree)
+        self.table.setFrameStyle(QFrame.NoFrame)  # Remove frame to prevent padding
+        self.table.setShowGrid(False)
+        self.table.setWordWrap(False)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)  # Editing goes through on_double_click
+        # Clicking a header sorts by that column; start unsorted, in file order
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
         
-        tree_layout.addWidget(scroll_area)
+        table_layout.addWidget(self.table)
         
         # Layout
         main_layout = QVBoxLayout()
         main_layout.addWidget(filter_frame)
-        main_layout.addWidget(tree_frame)
-        main_layout.setStretch(1, 1)  # Only the tree area should stretch
+        main_layout.addWidget(query_frame)
+        main_layout.addWidget(table_frame)
+        main_layout.setStretch(2, 1)  # Only the table area should stretch
         
         central_widget = QFrame()
         central_widget.setLayout(main_layout)
         self.setCentralWidget(central_widget)
         
-        # Connect signals
-        self.tree.itemSelectionChanged.connect(self.on_tree_select)
-        self.tree.itemDoubleClicked.connect(self.on_double_click)
+        # Loading progress lives in the status bar and is only shown while a file loads
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setMaximumWidth(250)
+        self.cancel_load_button = QPushButton("Cancel")
+        self.cancel_load_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.cancel_load_button.clicked.connect(self.cancel_load)
+        # Timing of the last operation, shown while Show Timings is checked
+        self.timing_label = QLabel("")
+        self.timing_label.hide()
+        self.timing_recorded.connect(lambda entry: self.timing_label.setText(format_entry(entry)))
+        # Removed again on close, so the monitor doesn't keep a closed editor alive
+        self.timing_listener = self.timing_recorded.emit
+        monitor.listeners.append(self.timing_listener)
+        self.statusBar().addPermanentWidget(self.timing_label)
+        # Rows with problems, kept up to date as rows are edited
+        self.problems_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.problems_label)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_load_button)
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
         
-        # Load window state from settings
-        self.load_window_state()
+        # Connect signals
+        self.table.selectionModel().selectionChanged.connect(self.on_tree_select)
+        self.table.doubleClicked.connect(self.on_double_click)
+        self.model.edited.connect(self.update_undo_actions)
+        self.model.edited.connect(self.revalidate)
+        self.model.modelReset.connect(self.update_undo_actions)
+        self.model.modelReset.connect(self.refresh_matches)
+        self.update_undo_actions()
 
     def load_stylesheet(self):
         """Load the stylesheet from style.css file if it exists"""
@@ -158,11 +748,20 @@ class JsonEditor(QMainWindow):
             # Don't set any fallback - let Qt use default styling
 
     def load_settings(self):
+        """Read settings.json once and apply it: last file, window geometry and column widths"""
         try:
             if os.path.exists(self.settings_file):
                 with open(self.settings_file, 'r') as f:
                     settings = json.load(f)
                     self.last_file_path = settings.get('last_file_path')
+                    self.undo_memory_mb = settings.get('undo_memory_mb', self.undo_memory_mb)
+                    # Room for cached files; 0 turns the cache off
+                    self.cache_size_mb = settings.get('cache_size_mb', self.cache_size_mb)
+                    # CooldownGroups a row may use; any other is reported as a problem
+                    self.known_cooldown_groups = settings.get('known_cooldown_groups', [])
+                    self.show_timings_action.setChecked(settings.get('show_timings', False))
+                    self.performance_log_action.setChecked(settings.get('performance_log', False))
+                    self.memory_map_action.setChecked(settings.get('memory_map_large_files', False))
                     # Load window geometry and state
                     if 'geometry' in settings and settings['geometry']:
                         geometry = QtCore.QByteArray.fromHex(settings['geometry'].encode('utf-8'))
@@ -177,6 +776,7 @@ class JsonEditor(QMainWindow):
             self.last_file_path = None
 
     def save_settings(self):
+        measurement = monitor.measure("save_settings")
         try:
             # Convert QByteArray to bytes for JSON serialization
             geometry = self.saveGeometry()
@@ -186,55 +786,367 @@ class JsonEditor(QMainWindow):
                 'last_file_path': getattr(self, 'current_file_path', None),
                 'geometry': geometry.toHex().data().decode('utf-8') if not geometry.isNull() else None,
                 'window_state': window_state.toHex().data().decode('utf-8') if not window_state.isNull() else None,
-                'column_widths': self.save_column_widths()
+                'column_widths': self.save_column_widths(),
+                'undo_memory_mb': self.undo_memory_mb,
+                'cache_size_mb': self.cache_size_mb,
+                'known_cooldown_groups': self.known_cooldown_groups,
+                'show_timings': self.show_timings_action.isChecked(),
+                'performance_log': self.performance_log_action.isChecked(),
+                'memory_map_large_files': self.memory_map_action.isChecked()
             }
             with open(self.settings_file, 'w') as f:
                 json.dump(settings, f, indent=4)
+            measurement.finish()
         except Exception as e:
+            measurement.finish(error=type(e).__name__)
             print(f"Failed to save settings: {e}")
 
+    def update_performance_monitor(self):
+        """Measure operations only while their timings are shown or logged"""
+        show = self.show_timings_action.isChecked()
+        self.timing_label.setVisible(show)
+        monitor.log_path = PERFORMANCE_LOG_FILE if self.performance_log_action.isChecked() else None
+        monitor.enabled = show or monitor.log_path is not None
+
+    def toggle_profiling(self, checked):
+        if checked:
+            monitor.start_profile()
+            self.statusBar().showMessage("Profiling; uncheck Profile with cProfile to save the results", 5000)
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Profile", "editor.prof", "Profile data (*.prof);;All files (*)"
+        )
+        try:
+            monitor.stop_profile(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to save profile: {e}")
+
     def save_column_widths(self):
-        """Save column widths from tree header"""
+        """Save column widths from table header"""
         widths = []
-        header = self.tree.header()
+        header = self.table.horizontalHeader()
         for i in range(header.count()):
             widths.append(header.sectionSize(i))
         return widths
 
     def load_column_widths(self, widths):
-        """Load column widths into tree header"""
-        header = self.tree.header()
+        """Load column widths into table header"""
+        header = self.table.horizontalHeader()
         for i, width in enumerate(widths):
             if i < header.count():
                 header.resizeSection(i, width)
 
-    def load_window_state(self):
-        """Load window state (position, size, maximized status)"""
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
-                    if 'geometry' in settings and settings['geometry']:
-                        geometry = QtCore.QByteArray.fromHex(settings['geometry'].encode('utf-8'))
-                        self.restoreGeometry(geometry)
-                    if 'window_state' in settings and settings['window_state']:
-                        window_state = QtCore.QByteArray.fromHex(settings['window_state'].encode('utf-8'))
-                        self.restoreState(window_state)
-        except Exception as e:
-            print(f"Failed to load window state: {e}")
-
     def load_file(self, file_path):
+        """Start loading file_path in the background, replacing the current table"""
+        self.stop_loader()
+        self.file_watcher.stop()
+        # Unsaved edits stay in the journal, to be offered again when the file is next opened
+        self.close_journal()
+        self.base_store = None
+        self.load_edits = []
+        self.data = None
+        self.filtered_items = []
+        self.current_filtered_index = -1
+        # Imported here; rows are only checked once a file is open
+        from validation import Validation
+        self.model.validation = Validation(self.known_cooldown_groups)
+        self.problems_label.setText("")
+        self.load_measurement.finish(error="replaced")
+        self.load_measurement = monitor.measure("load_file")
+        mapped = self.memory_map_action.isChecked() and self.file_size(file_path) >= MEMORY_MAP_THRESHOLD
+        previous = self.model.store
+        self.loader = FileLoader(file_path, self, mapped, None if mapped else self.get_file_cache())
+        self.model.set_store(self.loader.store, 0)
+        if is_mapped(previous):
+            previous.close()
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        # A memory-mapped file has no column indexes to sort by
+        self.table.setSortingEnabled(not mapped)
+        self.query_count_label.setText("")
+        self.update_counter()
+
+        self.loader.rows_loaded.connect(self.on_rows_loaded)
+        self.loader.progress.connect(self.on_load_progress)
+        self.loader.loaded.connect(self.on_file_loaded)
+        self.loader.failed.connect(self.on_load_failed)
+        self.loader.cancelled.connect(self.on_load_cancelled)
+        self.loader.finished.connect(self.loader.deleteLater)
+
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_load_button.show()
+        self.statusBar().showMessage(f"Loading {file_path}{' (memory-mapped)' if mapped else ''}...")
+        self.loader.start()
+
+    @staticmethod
+    def file_size(file_path):
         try:
-            with open(file_path, 'r') as f:
-                self.current_file_path = file_path
-                self.data = json.load(f)
-            self.populate_tree()
-            self.setWindowTitle(f"SCUM parameters.json Editor - {file_path}")
-            self.save_settings()  # Save the path after successful loading
-            # Update counter after loading file
+            return os.path.getsize(file_path)
+        except OSError:
+            return 0
+
+    def on_rows_loaded(self, count):
+        # Rows reported by a load that has since been abandoned are ignored
+        if self.sender() is not self.loader:
+            return
+        self.model.rows_loaded(count, self.loader.id_index)
+
+    def on_load_progress(self, value):
+        if self.sender() is self.loader:
+            self.progress_bar.setValue(value)
+
+    def on_file_loaded(self, document):
+        if self.sender() is not self.loader:
+            return
+        file_path = self.loader.file_path
+        mapped = self.loader.mapped
+        self.model.rows_loaded(len(self.loader.store), self.loader.id_index)
+        # The merge base for changes made on disk is the file as read, without edits made while it loaded
+        if self.loader.from_cache:
+            # The cache entry's document holds the store already
+            self.base_store = self.decoded_snapshot(self.loader.store)
+            self.build_json_cache(self.loader.store)
+        elif isinstance(document.get("Parameters"), list):
+            document["Parameters"] = self.loader.store
+            if not mapped:
+                self.base_store = self.decoded_snapshot(self.loader.store)
+                self.build_json_cache(self.loader.store)
+                self.cache_file(file_path, self.loader.signature, document, self.base_store)
+        self.data = document
+        self.current_file_path = file_path
+        # Merging changes made on disk needs the whole file decoded, so mapped files aren't watched
+        if not mapped:
+            self.file_watcher.watch(file_path)
+        self.load_measurement.finish(rows=self.model.rowCount())
+        self.finish_loading(f"Loaded {self.model.rowCount()} rows{' from the cache' if self.loader.from_cache else ''}")
+        self.setWindowTitle(f"SCUM parameters.json Editor - {file_path}")
+        self.save_settings()  # Save the path after successful loading
+        startup_report.mark("file_loaded")
+        startup_report.write()
+        parameters = document.get("Parameters")
+        if not isinstance(parameters, ParameterStore) and not is_mapped(parameters):
+            answer = QMessageBox.question(self, "No Parameters", "This file has no Parameters array to show in "
+                                          "the table. Open it as a JSON tree instead?")
+            if answer == QMessageBox.Yes:
+                self.show_tree(file_path)
+        self.start_journal(file_path)
+        self.validate()
+        # Apply any query and Find ID text typed while the file was loading
+        if self.query_input.text():
+            self.apply_query()
+        if self.filter_input.text():
+            self.filter_items(self.filter_input.text())
+        else:
             self.update_counter()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to open file: {e}")
+
+    def on_load_failed(self, message):
+        if self.sender() is not self.loader:
+            return
+        self.load_measurement.finish(error="failed")
+        self.model.set_store(ParameterStore())
+        self.finish_loading("")
+        self.update_counter()
+        startup_report.write()
+        QMessageBox.critical(self, "Error", f"Failed to open file: {message}")
+
+    def on_load_cancelled(self):
+        if self.sender() is not self.loader:
+            return
+        self.load_measurement.finish(error="cancelled")
+        self.model.set_store(ParameterStore())
+        self.current_file_path = None
+        self.finish_loading("Loading cancelled")
+        self.setWindowTitle("SCUM parameters.json Editor")
+        self.update_counter()
+
+    def finish_loading(self, message):
+        self.loader = None
+        self.load_measurement = NULL_MEASUREMENT
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
+        self.statusBar().showMessage(message, 5000)
+
+    def cancel_load(self):
+        if self.loader:
+            self.loader.requestInterruption()
+
+    def stop_loader(self):
+        """Cancel a load in progress and wait for its thread to exit"""
+        if self.loader:
+            loader = self.loader
+            loader.requestInterruption()
+            loader.wait()
+            self.loader = None
+
+    def on_file_changed_on_disk(self, document, disk_store):
+        """Merge the rows another program changed into the open file, keeping local edits"""
+        store = self.data.get("Parameters") if self.data else None
+        if self.loader or self.base_store is None or not isinstance(store, ParameterStore):
+            return
+        if not isinstance(document.get("Parameters"), list):
+            self.statusBar().showMessage("The file changed on disk but has no Parameters array; ignored", 5000)
+            return
+        # Imported here; merging is only needed once another program writes the file
+        from parameters_diff import merge_changes
+        with monitor.measure("reload_from_disk", len(disk_store)):
+            changes, conflicts = merge_changes(store, self.base_store, disk_store)
+            if changes:
+                self.model.commit(ChangeGroup(changes))
+        # Take other top-level keys as they are on disk
+        document["Parameters"] = store
+        self.data = document
+        self.base_store = disk_store
+        self.model.set_conflicts(self.model.conflict_ids | set(conflicts))
+        self.restart_journal(disk_store)
+        self.statusBar().showMessage(
+            f"Reloaded {sum(len(change) for change in changes)} changes made on disk", 5000)
+        if conflicts:
+            shown = ", ".join(conflicts[:10]) + (", ..." if len(conflicts) > 10 else "")
+            QMessageBox.warning(self, "File Changed on Disk",
+                                f"{len(conflicts)} rows were changed both here and on disk. "
+                                f"Your edits were kept and the rows are highlighted:\n{shown}")
+
+    def cache_file(self, file_path, signature, document, store):
+        """Write the cache entry for file_path in the background, from store (a snapshot of what the file holds)"""
+        self.start_background(CacheWriter(self.get_file_cache(), file_path, signature, document, store, self))
+
+    def get_file_cache(self):
+        """The FileCache of opened files, created on first use"""
+        if self.file_cache is None:
+            # Imported here; hashlib is slow to import and not needed to show the window
+            from file_cache import FileCache
+            self.file_cache = FileCache(os.path.join(os.path.dirname(os.path.abspath(self.settings_file)),
+                                                     CACHE_DIRECTORY), self.cache_size_mb * 1024 * 1024)
+        return self.file_cache
+
+    def note_load_edit(self, change):
+        if self.loader is not None:
+            self.load_edits.append(change)
+
+    def decoded_snapshot(self, store):
+        """A snapshot of store as it was read from the file, without the edits made while it loaded"""
+        snapshot = store.snapshot()
+        for change in reversed(self.load_edits):
+            apply_to_store(snapshot, change.inverted())
+        return snapshot
+
+    def build_json_cache(self, store):
+        """Serialize the rows of store as just loaded (base_store) in the background, ready for the first save"""
+        snapshot = self.base_store
+        store.begin_json_cache(snapshot)
+        builder = JsonCacheBuilder(snapshot, self)
+        builder.finished.connect(lambda: store.end_json_cache(snapshot))
+        self.start_background(builder)
+
+    def start_background(self, thread):
+        """Start thread, keeping it until it finishes so closing the window can wait for it"""
+        self.background_threads.append(thread)
+        thread.finished.connect(lambda: self.background_threads.remove(thread))
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
+    def start_journal(self, file_path):
+        """Offer to replay the edits left in file_path's journal, then journal the edits made to it"""
+        self.journal = None
+        try:
+            header, changes = read_journal(file_path)
+        except OSError:
+            # No journal: the file was saved or closed without edits
+            header, changes = None, []
+        except ValueError as e:
+            header, changes = None, []
+            path = journal_path(file_path)
+            QMessageBox.warning(self, "Unsaved Edits", f"Found unsaved edits that can't be read ({e}). "
+                                f"They were left in {path}.damaged")
+            try:
+                os.replace(path, path + ".damaged")
+            except OSError:
+                pass
+        if self.data.get("Parameters") is not self.model.store:
+            # Without a Parameters array there is nothing to edit or journal
+            return
+        self.journal = Journal(file_path)
+        if not changes:
+            self.journal_load_edits()
+            return
+        store = self.model.store
+        text = f"Found {len(changes)} unsaved changes made on {header.get('started', 'an earlier run')}."
+        changed = header.get("signature") != file_signature(file_path)
+        if changed:
+            text += "\n\nThe file was changed since, so they may no longer apply to the right rows."
+        fits = changes_fit(changes, len(store)) and (isinstance(store, ParameterStore)
+                                                     or all(isinstance(change, Change) for change in changes))
+        if not fits:
+            QMessageBox.warning(self, "Unsaved Edits", text + "\n\nThey don't fit the file as it is now "
+                                "and were discarded.")
+            self.journal.discard()
+            self.journal_load_edits()
+            return
+        answer = QMessageBox.question(self, "Unsaved Edits", text + "\n\nReplay them now?",
+                                      QMessageBox.Yes | QMessageBox.No,
+                                      QMessageBox.No if changed else QMessageBox.Yes)
+        if answer != QMessageBox.Yes:
+            self.journal.discard()
+            self.journal_load_edits()
+            return
+        # Made before the replayed edits, so journaled first
+        self.journal_load_edits()
+        # One undo step; journaling it writes the edits to a fresh journal of the file as it is now
+        with monitor.measure("replay_journal", len(changes)):
+            self.model.commit(ChangeGroup(changes))
+            self.sync_journal()
+        self.statusBar().showMessage(f"Replayed {len(changes)} unsaved changes", 5000)
+
+    def restart_journal(self, disk_store):
+        """Journal the local edits again against the file another program just wrote"""
+        if self.journal is None:
+            return
+        started = self.journal.started
+        self.journal.discard()
+        self.journal = Journal(self.current_file_path)
+        if started:
+            # Only what still differs from disk needs replaying onto the new file
+            from parameters_diff import ParametersDiff, changes_to_match
+            changes = changes_to_match(ParametersDiff(disk_store, self.model.store))
+            if changes:
+                self.journal_change(ChangeGroup(changes))
+
+    def journal_load_edits(self):
+        """Journal the edits made while the file loaded, before there was a journal to take them"""
+        for change in self.load_edits:
+            self.journal_change(change)
+
+    def journal_change(self, change):
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(change)
+        except OSError as e:
+            self.journal = None
+            self.statusBar().showMessage(f"Could not write the edit journal, edits are no longer journaled: {e}",
+                                         10000)
+            return
+        # At most one fsync per JOURNAL_SYNC_DELAY, however fast the edits come
+        if not self.journal_timer.isActive():
+            self.journal_timer.start()
+
+    def sync_journal(self):
+        self.journal_timer.stop()
+        if self.journal is None:
+            return
+        try:
+            self.journal.sync()
+        except OSError as e:
+            self.statusBar().showMessage(f"Could not write the edit journal: {e}", 10000)
+
+    def close_journal(self):
+        self.journal_timer.stop()
+        if self.journal is not None:
+            try:
+                self.journal.close()
+            except OSError:
+                pass
+            self.journal = None
 
     def open_file(self):
         # Get the directory of the last opened file or default to home directory
@@ -248,55 +1160,94 @@ class JsonEditor(QMainWindow):
         )
         if file_path:
             self.load_file(file_path)
-            # Save the last used directory
+            # Remember the directory; settings are saved once the file has loaded
             self.last_file_path = file_path
-            self.save_settings()
+
+    def compare_file(self):
+        """Open a window comparing the current file with another one"""
+        if self.data is None:
+            QMessageBox.information(self, "Compare", "Open a file to compare first.")
+            return
+        if is_mapped(self.model.store):
+            QMessageBox.information(self, "Compare", "Comparing needs the whole file loaded. Turn off "
+                                    "Memory-Map Files and open it again.")
+            return
+        directory = os.path.dirname(self.current_file_path) if self.current_file_path else os.path.expanduser("~")
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Compare With", directory, "JSON files (*.json);;All files (*)"
+        )
+        if not file_path:
+            return
+        from compare_window import CompareWindow
+        if self.compare_window is not None:
+            self.compare_window.close()
+        self.compare_window = CompareWindow(self, file_path)
+        self.compare_window.show()
+
+    def open_tree(self):
+        """Pick a JSON file to browse as a tree"""
+        directory = os.path.dirname(self.current_file_path) if self.current_file_path else os.path.expanduser("~")
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Open as JSON Tree", directory, "JSON files (*.json);;All files (*)"
+        )
+        if file_path:
+            self.show_tree(file_path)
+
+    def show_tree(self, file_path):
+        from tree_window import JsonTreeWindow
+        if self.tree_window is not None:
+            self.tree_window.close()
+        self.tree_window = JsonTreeWindow(self, file_path)
+        self.tree_window.show()
 
     def populate_tree(self):
-        self.tree.clear()
-        if self.data and "Parameters" in self.data:
-            for item in self.data["Parameters"]:
-                tree_item = QTreeWidgetItem()
-                tree_item.setText(0, str(item["Id"]))
-                tree_item.setText(1, str(item["IsDisabledForSpawning"]).lower())
-                tree_item.setText(2, str(item["AllowedLocations"]))
-                tree_item.setText(3, str(item["CooldownPerSquadMemberMin"]))
-                tree_item.setText(4, str(item["CooldownPerSquadMemberMax"]))
-                tree_item.setText(5, str(item["CooldownGroup"]))
-                tree_item.setText(6, str(item["Variations"]))
-                tree_item.setText(7, str(item["ShouldOverrideInitialAndRandomUsage"]).lower())
-                tree_item.setText(8, str(item["InitialUsageOverride"]))
-                tree_item.setText(9, str(item["RandomUsageOverrideUsage"]))
-                self.tree.addTopLevelItem(tree_item)
+        with monitor.measure("populate_tree") as measurement:
+            store = self.data.get("Parameters") if self.data else None
+            if isinstance(store, ParameterStore) or is_mapped(store):
+                self.model.set_store(store)
+            else:
+                self.model.set_store(ParameterStore())
+            measurement.rows = self.model.rowCount()
 
     def save_file(self):
-        if not self.data:
-            return
-
-        # Update data from tree
-        items = []
-        for i in range(self.tree.topLevelItemCount()):
-            item = self.tree.topLevelItem(i)
-            param = {
-                "Id": item.text(0),
-                "IsDisabledForSpawning": item.text(1).lower() == "true",
-                "AllowedLocations": self.parse_list(item.text(2)),
-                "CooldownPerSquadMemberMin": int(item.text(3)) if item.text(3) else 0,
-                "CooldownPerSquadMemberMax": int(item.text(4)) if item.text(4) else 0,
-                "CooldownGroup": item.text(5),
-                "Variations": self.parse_list(item.text(6)),
-                "ShouldOverrideInitialAndRandomUsage": item.text(7).lower() == "true",
-                "InitialUsageOverride": int(item.text(8)) if item.text(8) else 0,
-                "RandomUsageOverrideUsage": int(item.text(9)) if item.text(9) else 0
-            }
-            items.append(param)
-
-        self.data["Parameters"] = items
+        if not self.data or self.loader:
+            return
 
+        # Edits are written straight into the store, which only re-serializes edited rows
         try:
-            with open(self.current_file_path, 'w') as f:
-                json.dump(self.data, f, indent=4)
-            QMessageBox.information(self, "Success", "File saved successfully!")
+            mapped = is_mapped(self.model.store)
+            with monitor.measure("save_file", self.model.rowCount()):
+                if mapped:
+                    # Everything but the edited rows is copied from the file as it was
+                    self.model.store.save(self.current_file_path)
+                else:
+                    save_document(self.data, self.current_file_path)
+            store = self.data.get("Parameters")
+            if isinstance(store, ParameterStore) or is_mapped(store):
+                store.mark_saved()
+            if isinstance(store, ParameterStore):
+                self.base_store = store.snapshot()
+                self.model.set_conflicts(())
+                # What was written is what is open, so the next open can come from the cache
+                from file_cache import stat_signature
+                self.cache_file(self.current_file_path, stat_signature(self.current_file_path), self.data,
+                                self.base_store)
+            # The edits are in the file now; later ones go to a journal of the file as written
+            if self.journal is not None:
+                self.journal.discard()
+            self.journal = Journal(self.current_file_path)
+            # Don't mistake our own write for a change made by another program
+            if not mapped:
+                if self.file_watcher.file_path == self.current_file_path:
+                    self.file_watcher.remember()
+                else:
+                    self.file_watcher.watch(self.current_file_path)
+            problems = len(self.model.validation.problem_rows())
+            if problems:
+                QMessageBox.information(self, "Success", f"File saved successfully!\n\n{problems} rows have "
+                                        "problems; use Edit > Next Problem (F8) to go through them.")
+            else:
+                QMessageBox.information(self, "Success", "File saved successfully!")
             self.save_settings()  # Save settings after successful save
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save file: {e}")
@@ -309,42 +1260,36 @@ class JsonEditor(QMainWindow):
             self.current_file_path = file_path
             self.save_file()
 
-    def parse_list(self, value):
-        # Parse string representation of list to actual list
-        if value.startswith('[') and value.endswith(']'):
-            # Remove brackets and split by comma
-            items = value[1:-1].split(',')
-            return [item.strip().strip("'\"") for item in items if item.strip()]
-        return []
-
     def on_tree_select(self):
         pass
 
-    def on_double_click(self, item, column):
+    def on_double_click(self, index):
+        column = index.column()
         # Don't allow editing ID column
         if column == 0:
             return
             
         # Handle boolean columns
         if column == 1 or column == 7:
-            current_value = item.text(column)
+            current_value = self.model.data(index)
             new_value = "false" if current_value == "true" else "true"
-            item.setText(column, new_value)
+            self.model.setData(index, new_value)
             return
             
         # For other columns, show edit dialog
-        value = item.text(column)
+        value = self.model.data(index)
         
         # Special handling for AllowedLocations and Variations columns
         if column == 2 or column == 6:
             # Create a dialog with a multi-line text edit for editing
             dialog = QtWidgets.QDialog(self)
-            dialog.setWindowTitle(f"Edit {self.tree.headerItem().text(column)}")
+            dialog.setWindowTitle(f"Edit {COLUMNS[column]}")
             dialog.setModal(True)
             
             layout = QVBoxLayout()
             
-            # Create text edit with word wrap
+            # Create text edit with word wrap; imported here as it is not needed to show the window
+            from PyQt5.QtWidgets import QTextEdit
             text_edit = QTextEdit()
             text_edit.setPlainText(value)
             text_edit.setWordWrapMode(QtGui.QTextOption.WrapAnywhere)
@@ -369,55 +1314,94 @@ class JsonEditor(QMainWindow):
             
             if dialog.exec_() == QtWidgets.QDialog.Accepted:
                 new_value = text_edit.toPlainText()
-                item.setText(column, new_value)
+                self.set_cell(index, new_value)
         else:
             # For other columns, use regular input dialog
             new_value, ok = QtWidgets.QInputDialog.getText(self, "Edit Value", "Enter new value:", text=value)
             if ok:
-                item.setText(column, new_value)
+                self.set_cell(index, new_value)
+
+    def set_cell(self, index, text):
+        if not self.model.setData(index, text):
+            QMessageBox.warning(self, "Invalid Value", f"'{text}' is not a valid value for {COLUMNS[index.column()]}")
 
     def filter_items(self, text):
         filter_text = text.lower()
         
-        # Get all items
-        all_items = []
-        for i in range(self.tree.topLevelItemCount()):
-            all_items.append(self.tree.topLevelItem(i))
-        
-        self.filtered_items = []
-        
-        # Filter items by ID (case insensitive)
-        for item in all_items:
-            item_id = item.text(0).lower()
-            if filter_text in item_id:
-                self.filtered_items.append(item)
+        # Look the ID up in the search index (case insensitive)
+        with monitor.measure("filter_items") as measurement:
+            self.filtered_items = self.model.view_rows_for(self.model.id_index.search(filter_text))
+            measurement.rows = len(self.filtered_items)
         
         # Reset counter
         self.current_filtered_index = -1
         self.update_counter()
         
         # Clear selection
-        self.tree.clearSelection()
+        self.table.clearSelection()
         
         # If there's a filter, select first match and scroll to it
         if self.filtered_items and filter_text:
-            # Temporarily disable selection change signals to prevent flickering
-            self.tree.itemSelectionChanged.disconnect(self.on_tree_select)
-            
-            # Use a more controlled selection approach
-            if self.filtered_items:
-                self.tree.setCurrentItem(self.filtered_items[0])
-                # Force update without causing layout shifts
-                self.tree.scrollToItem(self.filtered_items[0], QAbstractItemView.PositionAtCenter)
-                self.current_filtered_index = 0
-                self.update_counter()
-            
-            # Reconnect the signal
-            self.tree.itemSelectionChanged.connect(self.on_tree_select)
+            self.current_filtered_index = 0
+            self.select_match()
+
+    def apply_query(self):
+        """Filter the table to the rows matching the query bar"""
+        text = self.query_input.text().strip()
+        if self.loader is not None:
+            # Applied once the file has loaded
+            return
+        if not text:
+            self.clear_query()
+            return
+        if is_mapped(self.model.store):
+            QMessageBox.information(self, "Query", "Queries need the whole file loaded. Turn off "
+                                    "Memory-Map Files and open it again.")
+            return
+        # Imported here; queries are only parsed once one is typed
+        from query import Query
+        try:
+            query = Query(text)
+        except ValueError as e:
+            QMessageBox.warning(self, "Query", f"Invalid query: {e}")
+            return
+        self.model.set_query(query)
+        self.query_count_label.setText(f"{self.model.rowCount()} of {len(self.model.store)} rows")
+
+    def clear_query(self):
+        self.query_input.clear()
+        self.query_count_label.setText("")
+        if self.model.query is not None:
+            self.model.set_query(None)
+
+    def refresh_matches(self):
+        """Recompute Find ID matches after rows were added or removed, keeping the selection"""
+        text = self.filter_input.text()
+        self.filtered_items = self.model.view_rows_for(self.model.id_index.search(text)) if text else []
+        self.current_filtered_index = min(self.current_filtered_index, len(self.filtered_items) - 1)
+        self.update_counter()
+
+    def select_match(self):
+        """Select the current filtered row and scroll it into view"""
+        row = self.filtered_items[self.current_filtered_index]
+        index = self.model.index(row, 0)
+        selection_model = self.table.selectionModel()
+        
+        # Temporarily disable selection change signals to prevent flickering
+        selection_model.selectionChanged.disconnect(self.on_tree_select)
+        
+        # Use a more controlled approach to avoid layout shifts
+        self.table.clearSelection()
+        self.table.setCurrentIndex(index)
+        self.table.scrollTo(index, QAbstractItemView.PositionAtCenter)
+        self.update_counter()
+        
+        # Reconnect the signal
+        selection_model.selectionChanged.connect(self.on_tree_select)
 
     def update_counter(self):
         # Get total items count
-        total_items = self.tree.topLevelItemCount()
+        total_items = self.model.rowCount()
         if self.filtered_items:
             self.counter_label.setText(f"{self.current_filtered_index + 1}/{len(self.filtered_items)}")
         else:
@@ -432,19 +1416,7 @@ class JsonEditor(QMainWindow):
         else:
             self.current_filtered_index = 0  # Loop back to first
             
-        item = self.filtered_items[self.current_filtered_index]
-        
-        # Temporarily disable selection change signals to prevent flickering
-        self.tree.itemSelectionChanged.disconnect(self.on_tree_select)
-        
-        # Use a more controlled approach to avoid layout shifts
-        self.tree.clearSelection()
-        self.tree.setCurrentItem(item)
-        self.tree.scrollToItem(item, QAbstractItemView.PositionAtCenter)
-        self.update_counter()
-        
-        # Reconnect the signal
-        self.tree.itemSelectionChanged.connect(self.on_tree_select)
+        self.select_match()
 
     def previous_match(self):
         if not self.filtered_items:
@@ -455,27 +1427,210 @@ class JsonEditor(QMainWindow):
         else:
             self.current_filtered_index = len(self.filtered_items) - 1  # Loop to last
             
-        item = self.filtered_items[self.current_filtered_index]
+        self.select_match()
+
+    def select_all_matches(self):
+        """Select every row matched by Find ID"""
+        if not self.filtered_items or not self.filter_input.text():
+            return
+        # Select runs of consecutive rows as single full-width ranges. The ranges
+        # are appended as they are and selected without the Rows flag, which
+        # would make Qt re-expand and merge every range one at a time.
+        selection = QItemSelection()
+        last_column = len(COLUMNS) - 1
+        rows = self.filtered_items
+        start = previous = rows[0]
+        for row in rows[1:]:
+            if row != previous + 1:
+                selection.append(QItemSelectionRange(self.model.index(start, 0), self.model.index(previous, last_column)))
+                start = row
+            previous = row
+        selection.append(QItemSelectionRange(self.model.index(start, 0), self.model.index(previous, last_column)))
+        self.table.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+        self.statusBar().showMessage(f"Selected {len(rows)} rows", 5000)
+
+    def selected_rows(self):
+        """The store rows behind the selected table rows"""
+        rows = set()
+        for selection_range in self.table.selectionModel().selection():
+            rows.update(range(selection_range.top(), selection_range.bottom() + 1))
+        return sorted(map(self.model.store_row, rows))
+
+    def bulk_edit(self):
+        """Set one column of every selected row to a value or an expression of its current value"""
+        rows = self.selected_rows()
+        if not rows:
+            QMessageBox.information(self, "Bulk Edit", "Select the rows to edit first.")
+            return
         
-        # Temporarily disable selection change signals to prevent flickering
-        self.tree.itemSelectionChanged.disconnect(self.on_tree_select)
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle(f"Bulk Edit {len(rows)} Rows")
+        dialog.setModal(True)
         
-        # Use a more controlled approach to avoid layout shifts
-        self.tree.clearSelection()
-        self.tree.setCurrentItem(item)
-        self.tree.scrollToItem(item, QAbstractItemView.PositionAtCenter)
-        self.update_counter()
+        layout = QVBoxLayout()
         
-        # Reconnect the signal
-        self.tree.itemSelectionChanged.connect(self.on_tree_select)
+        column_box = QtWidgets.QComboBox()
+        column_box.addItems(COLUMNS[1:])  # The Id column can't be edited
+        current = self.table.currentIndex()
+        if current.isValid() and current.column() > 0:
+            column_box.setCurrentIndex(current.column() - 1)
+        
+        value_input = QLineEdit()
+        value_input.setPlaceholderText("Value, or =expression using x, e.g. =x * 1.5")
+        
+        layout.addWidget(QLabel("Column:"))
+        layout.addWidget(column_box)
+        layout.addWidget(QLabel("New value:"))
+        layout.addWidget(value_input)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("OK")
+        cancel_button = QPushButton("Cancel")
+        
+        ok_button.clicked.connect(dialog.accept)
+        cancel_button.clicked.connect(dialog.reject)
+        
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        
+        dialog.setLayout(layout)
+        dialog.resize(400, 150)
+        
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        
+        name = column_box.currentText()
+        text = value_input.text()
+        try:
+            if text.startswith("="):
+                function = OPERATIONS["expression"](name, text[1:])
+            else:
+                function = OPERATIONS["set"](name, text)
+            with monitor.measure("bulk_edit", len(rows)):
+                changed = self.model.bulk_update(rows, COLUMNS.index(name), function)
+        except (ValueError, TypeError, ArithmeticError) as e:
+            QMessageBox.warning(self, "Bulk Edit", f"Could not apply '{text}' to {name}: {e}")
+            return
+        self.statusBar().showMessage(f"Changed {len(changed)} of {len(rows)} rows", 5000)
+
+    def validate(self):
+        """Check every row in the background; rows edited meanwhile are checked once it is done"""
+        if self.validation_thread is not None:
+            self.validation_rerun = True
+            return
+        store = self.model.store
+        self.validation_store = store
+        self.validation_pending = set()
+        self.validation_rerun = False
+        self.problems_label.setText("Checking rows...")
+        # A snapshot, so the check sees consistent columns while rows are being edited
+        snapshot = store.snapshot() if isinstance(store, ParameterStore) else store
+        self.validation_thread = ValidationThread(self.model.validation, snapshot, self)
+        self.validation_thread.checked.connect(self.on_validated)
+        self.validation_thread.finished.connect(self.validation_thread.deleteLater)
+        self.validation_thread.start()
+
+    def on_validated(self, results):
+        self.validation_thread = None
+        store, self.validation_store = self.validation_store, None
+        if store is not self.model.store or self.validation_rerun:
+            # Another file was opened, or rows were added or removed, while it ran
+            if self.loader is None:
+                self.validate()
+            return
+        validation = self.model.validation
+        validation.set_results(results)
+        if self.validation_pending:
+            validation.revalidate(store, sorted(self.validation_pending))
+            self.validation_pending = set()
+        self.show_problems()
+
+    def revalidate(self, change):
+        """Check the rows change touched, or every row after rows were added or removed or a large group of changes"""
+        if self.loader is not None:
+            return
+        from validation import INCREMENTAL_LIMIT
+        if not isinstance(change, Change) or len(change.rows) > INCREMENTAL_LIMIT:
+            self.validate()
+            return
+        if self.validation_thread is not None:
+            self.validation_pending.update(change.rows)
+            return
+        self.model.validation.revalidate(self.model.store, change.rows, change.column)
+        self.show_problems()
+
+    def show_problems(self):
+        validation = self.model.validation
+        rows = len(validation.problem_rows()) if validation is not None else 0
+        self.problems_label.setText(f"{rows} rows with problems (F8)" if rows else "")
+        self.model.highlights_changed()
+
+    def next_problem(self, backwards=False):
+        """Select the next (or previous) row with a problem, wrapping around"""
+        validation = self.model.validation
+        rows = self.model.view_rows_for(validation.problem_rows()) if validation is not None else []
+        if not rows:
+            self.statusBar().showMessage("No problems found", 5000)
+            return
+        current = self.table.currentIndex().row()
+        if backwards:
+            row = rows[bisect_left(rows, current if current >= 0 else rows[-1] + 1) - 1]
+        else:
+            row = rows[bisect_right(rows, current) % len(rows)]
+        store_row = self.model.store_row(row)
+        column = next((column for column in range(len(COLUMNS)) if validation.message(store_row, column)), 0)
+        index = self.model.index(row, column)
+        self.table.setCurrentIndex(index)
+        self.table.scrollTo(index, QAbstractItemView.PositionAtCenter)
+        self.statusBar().showMessage(validation.message(store_row, column), 10000)
+
+    def undo(self):
+        self.show_change(self.model.undo(), "Undid")
+
+    def redo(self):
+        self.show_change(self.model.redo(), "Redid")
+
+    def show_change(self, change, verb):
+        if change is None:
+            return
+        row = self.model.view_row(min(change.first_row(), len(self.model.store) - 1))
+        if row >= 0:
+            index = self.model.index(row, getattr(change, 'column', 0))
+            self.table.setCurrentIndex(index)
+            self.table.scrollTo(index, QAbstractItemView.PositionAtCenter)
+        if isinstance(change, Change):
+            self.statusBar().showMessage(f"{verb} change to {COLUMNS[change.column]} in {len(change)} rows", 5000)
+        else:
+            self.statusBar().showMessage(f"{verb} change to {len(change)} cells and rows", 5000)
+
+    def update_undo_actions(self):
+        self.undo_action.setEnabled(self.model.history.can_undo())
+        self.redo_action.setEnabled(self.model.history.can_redo())
 
     def closeEvent(self, event):
         """Save settings when closing the application"""
+        if self.timing_listener in monitor.listeners:
+            monitor.listeners.remove(self.timing_listener)
+        self.stop_loader()
+        self.file_watcher.stop()
+        if self.validation_thread is not None:
+            self.validation_thread.wait()
+        self.close_journal()
+        for thread in self.background_threads:
+            thread.wait()
+        if self.compare_window is not None:
+            self.compare_window.close()
+        if self.tree_window is not None:
+            self.tree_window.close()
         self.save_settings()
         event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    startup_report.mark("application_created")
     editor = JsonEditor()
     editor.show()
+    startup_report.mark("window_shown")
     sys.exit(app.exec_())
@@ -0,0 +1,263 @@
+"""Any JSON file, memory-mapped and read one container at a time.
+
+Opening a file reads nothing. Listing a container's children finds where
+each one starts and ends, a page at a time, and a value is decoded only
+when it is small enough to show, so memory follows what has been looked at
+rather than the size of the file. Like parameters_core, this module does
+not import PyQt.
+"""
+import json
+import mmap
+from collections import deque
+
+from mapped_store import skip_value, skip_whitespace
+
+# Children listed per container each time more are asked for
+PAGE_SIZE = 1000
+# Values up to this many bytes are decoded whole when first shown
+DECODE_LIMIT = 64 * 1024
+# Objects looked at when working out the columns, and the most columns to infer
+COLUMN_SAMPLE = 200
+MAX_COLUMNS = 30
+# Longest text shown for one value
+SHOWN_LENGTH = 200
+
+OBJECT = "object"
+ARRAY = "array"
+SCALAR = "scalar"
+
+_KINDS = {ord('{'): OBJECT, ord('['): ARRAY}
+
+
+class JsonNode:
+    """One value of the document: where it is in the file, or the value itself.
+
+    Nodes inside a value that was decoded whole have no position (start is
+    -1) and hold their value. children lists the child nodes found so far;
+    complete is set once every one of them has been.
+    """
+    __slots__ = ("parent", "key", "row", "kind", "start", "end", "value", "decoded",
+                 "children", "complete", "cursor")
+
+    def __init__(self, parent, key, row, kind, start=-1, end=-1, value=None, decoded=False):
+        self.parent = parent
+        self.key = key
+        self.row = row
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.value = value
+        self.decoded = decoded
+        self.children = []
+        self.complete = kind == SCALAR
+        # Where listing the children carries on from: a byte offset, or an index into value
+        self.cursor = None
+
+    def count(self):
+        """The number of children, or -1 if they haven't all been found yet"""
+        if self.decoded and self.kind != SCALAR:
+            return len(self.value)
+        return len(self.children) if self.complete else -1
+
+
+def kind_of(value):
+    if isinstance(value, dict):
+        return OBJECT
+    if isinstance(value, list):
+        return ARRAY
+    return SCALAR
+
+
+def format_scalar(value):
+    """value as shown in a cell: strings as they are, everything else as JSON"""
+    text = value if isinstance(value, str) else json.dumps(value)
+    return text if len(text) <= SHOWN_LENGTH else text[:SHOWN_LENGTH] + "..."
+
+
+def describe(kind, count):
+    """{3 keys} or [3 items]"""
+    if kind == OBJECT:
+        return f"{{{count} key{'' if count == 1 else 's'}}}"
+    return f"[{count} item{'' if count == 1 else 's'}]"
+
+
+def format_size(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class LazyDocument:
+    """A memory-mapped JSON file whose values are read as they are asked for"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = None
+        self.map = None
+        self.root = None
+
+    def open(self):
+        self.file = open(self.file_path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            self.file = None
+            raise ValueError("The file is empty")
+        data = self.map
+        start = skip_whitespace(data, 0)
+        end = len(data)
+        while end > start and data[end - 1] in b' \t\r\n':
+            end -= 1
+        if start == end:
+            raise ValueError("The file is empty")
+        self.root = JsonNode(None, "", 0, _KINDS.get(data[start], SCALAR), start, end)
+        if self.root.kind == SCALAR:
+            self.value(self.root)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def value(self, node):
+        """The decoded value of node, or None if it is too large or broken to decode (check node.decoded).
+
+        A broken value is left to read_children, which says where it breaks.
+        """
+        if not node.decoded and node.end - node.start <= DECODE_LIMIT:
+            try:
+                node.value = json.loads(self.map[node.start:node.end])
+            except ValueError:
+                return None
+            node.decoded = True
+        return node.value
+
+    def has_children(self, node):
+        if node.kind == SCALAR:
+            return False
+        if node.children:
+            return True
+        if node.decoded:
+            return bool(node.value)
+        # Empty unless the closing bracket comes straight after the opening one
+        return self.map[skip_whitespace(self.map, node.start + 1)] not in b']}'
+
+    def read_children(self, node, count=PAGE_SIZE):
+        """Find up to count more children of node, returning them and whether they were the last.
+
+        The new nodes are not added to node.children; the caller does that
+        (and sets node.complete), so a view can be told before they appear.
+        Raises ValueError where the file is not valid JSON.
+        """
+        if node.complete:
+            return [], True
+        first = len(node.children)
+        self.value(node)
+        if node.decoded:
+            return self.decoded_children(node, first, count)
+        data = self.map
+        pos = node.cursor
+        if pos is None:
+            pos = skip_whitespace(data, node.start + 1)
+        closing = b'}' if node.kind == OBJECT else b']'
+        children = []
+        complete = data[pos:pos + 1] == closing
+        while not complete and len(children) < count:
+            row = first + len(children)
+            if node.kind == OBJECT:
+                end = skip_value(data, pos)
+                key = json.loads(data[pos:end])
+                if not isinstance(key, str):
+                    raise ValueError(f"Expecting property name at byte {pos}")
+                pos = skip_whitespace(data, end)
+                if data[pos:pos + 1] != b':':
+                    raise ValueError(f"Expecting ':' at byte {pos}")
+                pos = skip_whitespace(data, pos + 1)
+            else:
+                key = row
+            if pos >= len(data):
+                raise ValueError(f"Expecting value at byte {pos}")
+            end = skip_value(data, pos)
+            children.append(JsonNode(node, key, row, _KINDS.get(data[pos], SCALAR), pos, end))
+            pos = skip_whitespace(data, end)
+            separator = data[pos:pos + 1]
+            if separator == closing:
+                complete = True
+            elif separator == b',':
+                pos = skip_whitespace(data, pos + 1)
+            else:
+                raise ValueError(f"Expecting ',' or '{closing.decode()}' at byte {pos}")
+        node.cursor = pos
+        return children, complete
+
+    def decoded_children(self, node, first, count):
+        value = node.value
+        items = list(value.items())[first:first + count] if node.kind == OBJECT else value[first:first + count]
+        children = []
+        for offset, item in enumerate(items):
+            key, item = item if node.kind == OBJECT else (first + offset, item)
+            children.append(JsonNode(node, key, first + offset, kind_of(item), value=item, decoded=True))
+        return children, first + len(children) >= len(value)
+
+    def fetch(self, node, count=PAGE_SIZE):
+        """List up to count more children of node"""
+        children, complete = self.read_children(node, count)
+        node.children.extend(children)
+        node.complete = complete
+        return children
+
+    def summary(self, node):
+        """Text standing for node's value: the value itself if it is small, else what it holds"""
+        value = self.value(node)
+        if node.kind == SCALAR:
+            return format_scalar(value) if node.decoded else f"({format_size(node.end - node.start)} value)"
+        count = node.count()
+        if count < 0:
+            return f"({format_size(node.end - node.start)})"
+        return describe(node.kind, count)
+
+    def field(self, node, key):
+        """Text for key of the object node, or "" when it has no such key or is too large to decode"""
+        if node.kind != OBJECT:
+            return ""
+        value = self.value(node)
+        if not node.decoded or key not in value:
+            return ""
+        value = value[key]
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return format_scalar(", ".join(value))
+        if isinstance(value, (dict, list)):
+            return describe(kind_of(value), len(value))
+        return format_scalar(value)
+
+    def infer_columns(self, sample=COLUMN_SAMPLE, limit=MAX_COLUMNS):
+        """Names of the keys the first objects held in arrays have, in the order they first appear.
+
+        Containers are listed breadth first from the root, a page each, until
+        sample objects (or sample containers) have been looked at; the pages
+        listed are kept.
+        """
+        columns = {}
+        queue = deque([self.root])
+        looked_at = listed = 0
+        while queue and looked_at < sample and listed < sample:
+            node = queue.popleft()
+            listed += 1
+            if not node.children and not node.complete:
+                self.fetch(node)
+            for child in node.children:
+                if child.kind != SCALAR and node.kind == OBJECT or child.kind == ARRAY:
+                    queue.append(child)
+                if node.kind == ARRAY and child.kind == OBJECT and looked_at < sample:
+                    looked_at += 1
+                    value = self.value(child)
+                    if child.decoded:
+                        for key in value:
+                            columns.setdefault(key, None)
+        return list(columns)[:limit]
@@ -0,0 +1,347 @@
+"""Memory-mapped Parameters for files too large to decode up front.
+
+Opening a file only scans the Parameters array for where each record starts
+and ends, and reads its Id; a record is decoded when it is first shown.
+Saving copies the file's original bytes and re-serializes only the records
+that were edited, so everything else stays byte for byte what it was. Like
+parameters_core, this module does not import PyQt.
+"""
+import json
+import mmap
+import re
+from array import array
+from collections import OrderedDict
+
+from parameters_core import BATCH_SIZE, COLUMN_INDEX, COLUMNS, MISSING, replace_file
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+# The Id of a record that has it as its first key
+_FIRST_ID = re.compile(rb'\{[ \t\n\r]*"Id"[ \t\n\r]*:[ \t\n\r]*"([^"\\]*)"')
+_STRUCTURE = re.compile(_STRING + rb'|[\[\]{}]')
+_STRING_TOKEN = re.compile(_STRING)
+_SCALAR = re.compile(rb'[^,:\[\]{}" \t\n\r]+')
+
+# Records copied between edits are written this many bytes at a time
+COPY_CHUNK = 16 * 1024 * 1024
+# Decoded records kept for redrawing the rows on screen
+CACHE_SIZE = 4096
+
+
+def _error(message, pos):
+    return ValueError(f"{message} at byte {pos}")
+
+
+def skip_whitespace(data, pos):
+    return _WHITESPACE.match(data, pos).end()
+
+
+def flat_object_end(data, pos):
+    """Where the object at pos ends if it holds no other object, else 0.
+
+    Such an object ends at the first '}': it holds no other brace, and no
+    escapes or odd quotes that could hide one in a string.
+    """
+    end = data.find(b'}', pos) + 1
+    if (end and data[pos:pos + 1] == b'{' and data.find(b'{', pos + 1, end) < 0
+            and data.find(b'\\', pos, end) < 0 and not data[pos:end].count(b'"') & 1):
+        return end
+    return 0
+
+
+def skip_value(data, pos):
+    """Return where the JSON value starting at pos ends"""
+    first = data[pos:pos + 1]
+    if first == b'"':
+        match = _STRING_TOKEN.match(data, pos)
+    elif first == b'[':
+        # Element by element, so arrays of records take the flat object shortcut
+        pos = skip_whitespace(data, pos + 1)
+        if data[pos:pos + 1] == b']':
+            return pos + 1
+        while True:
+            pos = skip_whitespace(data, skip_value(data, pos))
+            separator = data[pos:pos + 1]
+            if separator == b']':
+                return pos + 1
+            if separator != b',':
+                raise _error("Expecting ',' or ']'", pos)
+            pos = skip_whitespace(data, pos + 1)
+    elif first == b'{':
+        end = flat_object_end(data, pos)
+        if end:
+            return end
+        depth = 0
+        for match in _STRUCTURE.finditer(data, pos):
+            token = match.group()
+            if token in (b'{', b'['):
+                depth += 1
+            elif token in (b'}', b']'):
+                depth -= 1
+                if not depth:
+                    return match.end()
+        raise _error("Unterminated value", pos)
+    else:
+        match = _SCALAR.match(data, pos)
+    if match is None:
+        raise _error("Expecting value", pos)
+    return match.end()
+
+
+class MappedParameterStore:
+    """The Parameters records of a file, read from a memory map on demand.
+
+    Offers the parts of ParameterStore the table and the row edits use:
+    len(), ids, get(), set(), record() and dirty_rows. Edited records are
+    kept decoded in edits until the next save. There are no typed columns,
+    so queries, sorting and comparisons need the file loaded normally.
+
+    scan() reads the file and must run to completion before anything else;
+    FileLoader calls it on its thread and hands over batches of rows as the
+    scan gets through them.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = None
+        self.map = None
+        self.starts = array('q')
+        self.ends = array('q')
+        self.ids = []
+        # Every top-level section but Parameters, once scanned
+        self.document = None
+        self.position = 0
+        self.size = 0
+        # row -> record as edited
+        self.edits = {}
+        self.cache = OrderedDict()
+        self.dirty_rows = set()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def open(self):
+        self.file = open(self.file_path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            self.file.close()
+            self.file = None
+            raise ValueError("The file is empty")
+        self.size = len(self.map)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def skip_whitespace(self, pos):
+        return skip_whitespace(self.map, pos)
+
+    def expect(self, pos, chars):
+        pos = self.skip_whitespace(pos)
+        if pos >= self.size or self.map[pos] not in chars:
+            raise _error(f"Expecting one of {chars.decode()!r}", pos)
+        return pos + 1
+
+    def skip_value(self, pos):
+        return skip_value(self.map, pos)
+
+    def scan(self, batch_size=BATCH_SIZE):
+        """Find every record, yielding the number found after each batch_size of them"""
+        self.open()
+        data = self.map
+        starts, ends, ids = self.starts, self.ends, self.ids
+        first_id = _FIRST_ID.match
+        document = {}
+        pos = self.skip_whitespace(self.expect(0, b'{'))
+        if data[pos:pos + 1] == b'}':
+            pos += 1
+        else:
+            while True:
+                pos = self.skip_whitespace(pos)
+                end = self.skip_value(pos)
+                key = json.loads(data[pos:end])
+                if not isinstance(key, str):
+                    raise _error("Expecting property name", pos)
+                pos = self.skip_whitespace(self.expect(end, b':'))
+                if key == "Parameters" and data[pos:pos + 1] == b'[':
+                    document[key] = []
+                    pos = self.skip_whitespace(pos + 1)
+                    if data[pos:pos + 1] == b']':
+                        pos += 1
+                    else:
+                        count = 0
+                        while True:
+                            # A record normally ends at the first '}'; anything else is
+                            # matched bracket by bracket
+                            end = flat_object_end(data, pos)
+                            if end:
+                                match = first_id(data, pos, end)
+                            else:
+                                end = self.skip_value(pos)
+                                match = None
+                            starts.append(pos)
+                            ends.append(end)
+                            if match is not None:
+                                ids.append(match.group(1).decode())
+                            else:
+                                try:
+                                    record = self.decode(len(starts) - 1)
+                                except ValueError:
+                                    record = None
+                                ids.append(record.get("Id", MISSING) if isinstance(record, dict) else MISSING)
+                            count += 1
+                            if count == batch_size:
+                                count = 0
+                                self.position = end
+                                yield len(starts)
+                            pos = self.expect(end, b',]')
+                            if data[pos - 1] == ord(']'):
+                                break
+                            pos = self.skip_whitespace(pos)
+                        if count:
+                            self.position = pos
+                            yield len(starts)
+                else:
+                    end = self.skip_value(pos)
+                    document[key] = json.loads(data[pos:end])
+                    pos = end
+                pos = self.expect(pos, b',}')
+                if data[pos - 1] == ord('}'):
+                    break
+        if self.skip_whitespace(pos) != self.size:
+            raise _error("Extra data", pos)
+        self.position = self.size
+        self.document = document
+
+    def decode(self, row):
+        return json.loads(self.map[self.starts[row]:self.ends[row]])
+
+    def record(self, row):
+        """The JSON value of row, as edited; don't modify it"""
+        record = self.edits.get(row)
+        if record is not None:
+            return record
+        record = self.cache.get(row)
+        if record is not None:
+            self.cache.move_to_end(row)
+        else:
+            record = self.decode(row)
+            self.cache[row] = record
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return record
+
+    def get(self, row, column):
+        try:
+            record = self.record(row)
+        except ValueError:
+            # Only brackets and quotes are checked by the scan; show a broken record as empty
+            return MISSING
+        if not isinstance(record, dict):
+            return MISSING
+        value = record.get(COLUMNS[column], MISSING)
+        # Lists of strings come back as tuples, as from ParameterStore
+        if type(value) is list and all(type(item) is str for item in value):
+            return tuple(value)
+        return value
+
+    def set(self, row, column, value):
+        """Change a value and mark its row as edited"""
+        record = self.record(row)
+        if not isinstance(record, dict):
+            raise ValueError(f"Row {row + 1} is not an object and cannot be edited")
+        # Replacing the value keeps the key where it was; new keys go at the end
+        record = dict(record)
+        name = COLUMNS[column]
+        if value is MISSING:
+            record.pop(name, None)
+        else:
+            record[name] = list(value) if isinstance(value, tuple) else value
+        if column == COLUMN_INDEX["Id"]:
+            self.ids[row] = value
+        self.cache.pop(row, None)
+        self.dirty_rows.add(row)
+        # Setting a record back to what the file holds (as undo does) keeps its original bytes
+        if json.dumps(record) == json.dumps(self.decode(row)):
+            self.edits.pop(row, None)
+        else:
+            self.edits[row] = record
+
+    def mark_saved(self):
+        self.dirty_rows.clear()
+
+    def serialize(self, row):
+        """The edited record formatted like the original one around it"""
+        data = self.map
+        start, end = self.starts[row], self.ends[row]
+        original = data[start:end]
+        newline = b"\r\n" if b"\r\n" in original else b"\n"
+        if b"\n" not in original:
+            return json.dumps(self.edits[row]).encode()
+        line_start = data.rfind(b"\n", 0, start) + 1
+        indent = data[line_start:start]
+        if indent.strip():
+            # Something else precedes the record on its line
+            indent = b""
+        # The first key's line gives the indent of one level
+        second_line = original.split(b"\n", 2)[1]
+        field_indent = second_line[:len(second_line) - len(second_line.lstrip())].rstrip(b"\r")
+        step = field_indent[len(indent):] if field_indent.startswith(indent) else b""
+        text = json.dumps(self.edits[row], indent=step.decode() or 4).encode()
+        return text.replace(b"\n", newline + indent)
+
+    def write(self, f, texts):
+        """Write the file with texts, the serialized edited records, in place of the originals"""
+        position = 0
+        for row in sorted(texts):
+            self.copy(f, position, self.starts[row])
+            f.write(texts[row])
+            position = self.ends[row]
+        self.copy(f, position, self.size)
+
+    def copy(self, f, start, end):
+        data = self.map
+        for position in range(start, end, COPY_CHUNK):
+            f.write(data[position:min(position + COPY_CHUNK, end)])
+
+    def save(self, file_path):
+        """Write the file with the edits to file_path and map the written file from then on"""
+        texts = {row: self.serialize(row) for row in self.edits}
+
+        def write(f):
+            self.write(f, texts)
+            # The file can't be replaced while it is mapped on Windows
+            self.close()
+        try:
+            replace_file(file_path, write, binary=True)
+        except BaseException:
+            if self.map is None:
+                self.open()
+            raise
+        self.file_path = file_path
+        self.shift({row: len(text) for row, text in texts.items()})
+        self.edits.clear()
+        self.cache.clear()
+        self.open()
+
+    def shift(self, lengths):
+        """Move the record offsets to where records of the given new lengths put them"""
+        starts, ends = self.starts, self.ends
+        rows = sorted(lengths)
+        delta = 0
+        for index, row in enumerate(rows):
+            length = ends[row] - starts[row]
+            starts[row] += delta
+            ends[row] = starts[row] + lengths[row]
+            delta += lengths[row] - length
+            if delta:
+                # Every row up to the next edited one moves by the same amount
+                stop = rows[index + 1] if index + 1 < len(rows) else len(starts)
+                starts[row + 1:stop] = array('q', [start + delta for start in starts[row + 1:stop]])
+                ends[row + 1:stop] = array('q', [end + delta for end in ends[row + 1:stop]])
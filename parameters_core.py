@@ -0,0 +1,844 @@
+"""Parameters file handling shared by the editor and its background workers.
+
+Nothing in this module imports PyQt, so it can be used from worker threads
+and scripts without a running application.
+"""
+import fnmatch
+import json
+import operator
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from json.encoder import encode_basestring_ascii
+
+# Columns shown in the table, in display order. Each one is a key of a Parameters record.
+COLUMNS = [
+    "Id", "IsDisabledForSpawning", "AllowedLocations",
+    "CooldownPerSquadMemberMin", "CooldownPerSquadMemberMax",
+    "CooldownGroup", "Variations", "ShouldOverrideInitialAndRandomUsage",
+    "InitialUsageOverride", "RandomUsageOverrideUsage"
+]
+BOOL_COLUMNS = {"IsDisabledForSpawning", "ShouldOverrideInitialAndRandomUsage"}
+INT_COLUMNS = {"CooldownPerSquadMemberMin", "CooldownPerSquadMemberMax",
+               "InitialUsageOverride", "RandomUsageOverrideUsage"}
+LIST_COLUMNS = {"AllowedLocations", "Variations"}
+# Columns whose values repeat across many rows and are stored once in a shared pool
+POOLED_COLUMNS = {"CooldownGroup"} | LIST_COLUMNS
+COLUMN_INDEX = {name: column for column, name in enumerate(COLUMNS)}
+
+# Largest and smallest values that fit the int column arrays
+INT_MIN = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+
+# Number of records handed to the view at a time while a file is loading
+BATCH_SIZE = 5000
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def parse_list(value):
+    # Parse string representation of list to actual list
+    if value.startswith('[') and value.endswith(']'):
+        # Remove brackets and split by comma
+        items = value[1:-1].split(',')
+        return [item.strip().strip("'\"") for item in items if item.strip()]
+    return []
+
+
+class _Missing:
+    """Marks a column that is absent from a record"""
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __str__(self):
+        return ""
+
+
+MISSING = _Missing()
+
+
+def format_value(column, value):
+    """Format a record value the way it is shown in the table"""
+    if value is MISSING:
+        return ""
+    if column in BOOL_COLUMNS:
+        return str(value).lower()
+    if isinstance(value, tuple):
+        return str(list(value))
+    return str(value)
+
+
+def parse_value(column, text):
+    """Convert edited cell text back to the JSON value stored in the record"""
+    if column in BOOL_COLUMNS:
+        return text.lower() == "true"
+    if column in LIST_COLUMNS:
+        return parse_list(text)
+    if column in INT_COLUMNS:
+        return int(text) if text else 0
+    return text
+
+
+class DocumentReader:
+    """Decode a parameters document one Parameters record at a time.
+
+    Iterating over batches() yields lists of decoded records as the
+    Parameters array is read, so the caller can show rows (and stop) long
+    before the whole document has been decoded. Once iteration is complete,
+    document holds every other top-level section and an empty Parameters
+    list for the caller to fill with the records it collected.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.position = 0
+        self.document = None
+
+    def skip_whitespace(self, pos):
+        return _WHITESPACE.match(self.text, pos).end()
+
+    def expect(self, pos, chars):
+        pos = self.skip_whitespace(pos)
+        if pos >= len(self.text) or self.text[pos] not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self.text, pos)
+        return pos + 1
+
+    def batches(self, batch_size=BATCH_SIZE):
+        text = self.text
+        document = {}
+        pos = self.expect(0, '{')
+        pos = self.skip_whitespace(pos)
+        if text.startswith('}', pos):
+            pos += 1
+        else:
+            while True:
+                key, pos = _decoder.raw_decode(text, self.skip_whitespace(pos))
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError("Expecting property name", text, pos)
+                pos = self.skip_whitespace(self.expect(pos, ':'))
+                if key == "Parameters" and text.startswith('[', pos):
+                    document[key] = []
+                    pos = self.skip_whitespace(pos + 1)
+                    if text.startswith(']', pos):
+                        pos += 1
+                    else:
+                        batch = []
+                        while True:
+                            record, pos = _decoder.raw_decode(text, pos)
+                            batch.append(record)
+                            if len(batch) >= batch_size:
+                                self.position = pos
+                                yield batch
+                                batch = []
+                            pos = self.expect(pos, ',]')
+                            if text[pos - 1] == ']':
+                                break
+                            pos = self.skip_whitespace(pos)
+                        if batch:
+                            self.position = pos
+                            yield batch
+                else:
+                    document[key], pos = _decoder.raw_decode(text, pos)
+                pos = self.expect(pos, ',}')
+                if text[pos - 1] == '}':
+                    break
+        if self.skip_whitespace(pos) != len(text):
+            raise json.JSONDecodeError("Extra data", text, pos)
+        self.position = len(text)
+        self.document = document
+
+
+class ValuePool:
+    """Stores each distinct value once and hands out small integer codes for it"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class ParameterStore:
+    """Column oriented, typed storage for the Parameters records.
+
+    Booleans live in bytearrays, integers in 64-bit arrays, and the
+    CooldownGroup, AllowedLocations and Variations values in a shared
+    ValuePool so each distinct group or list is kept once no matter how many
+    rows use it. Lists are stored as tuples of interned strings.
+
+    Values that do not fit their column type (a string cooldown, a missing
+    key, a list holding objects) are kept unchanged in overrides, and records
+    with extra keys or a different key order remember their layout, so
+    writing a record back produces what was read.
+    """
+
+    def __init__(self):
+        self.columns = []
+        for name in COLUMNS:
+            if name == "Id":
+                self.columns.append([])
+            elif name in BOOL_COLUMNS:
+                self.columns.append(bytearray())
+            elif name in INT_COLUMNS:
+                self.columns.append(array('q'))
+            else:
+                self.columns.append(array('I'))
+        self.pool = ValuePool()
+        # (row, column) -> value for values the typed columns cannot hold
+        self.overrides = {}
+        # row -> (key order, extra keys) for records that are not plain COLUMNS dicts
+        self.layouts = {}
+        # Rows that have overrides or a layout and need the generic serializer
+        self.irregular_rows = set()
+        # Pre-rendered JSON for pooled values, filled on first save
+        self.pool_json = {}
+        # Rows edited since the last successful save
+        self.dirty_rows = set()
+        # Serialized Parameters body from the first save (or end_json_cache), the
+        # span of each row in it, and replacement text for rows edited since it was built
+        self.json_cache = None
+        self.json_starts = array('q')
+        self.json_ends = array('q')
+        self.json_patches = {}
+        self.stale_rows = set()
+        # Snapshot building json_cache off the GUI thread, for end_json_cache() to take
+        self.json_base = None
+
+    @classmethod
+    def from_records(cls, records):
+        store = cls()
+        store.extend(records)
+        return store
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    @property
+    def ids(self):
+        return self.columns[0]
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        row = len(self)
+        if not isinstance(record, dict):
+            # Not an object at all; keep it as is and show an empty row
+            for column in range(len(COLUMNS)):
+                self.columns[column].append(0 if column else MISSING)
+                self.store_value(row, column, MISSING)
+            self.layouts[row] = (None, record)
+            return
+        columns = self.columns
+        pool = self.pool
+        for column, name in enumerate(COLUMNS):
+            value = record.get(name, MISSING)
+            data = columns[column]
+            # Fast paths for values that fit their column; anything else goes through set()
+            kind = type(value)
+            if name in INT_COLUMNS:
+                if kind is int and INT_MIN <= value <= INT_MAX:
+                    data.append(value)
+                    continue
+            elif name in BOOL_COLUMNS:
+                if kind is bool:
+                    data.append(value)
+                    continue
+            elif name in LIST_COLUMNS:
+                if kind is list:
+                    try:
+                        code = pool.codes.get(tuple(value))
+                    except TypeError:
+                        code = None
+                    if code is not None:
+                        data.append(code)
+                        continue
+            elif kind is str:
+                if column:
+                    value = sys.intern(value)
+                    code = pool.codes.get(value)
+                    data.append(pool.code(value) if code is None else code)
+                else:
+                    data.append(value)
+                continue
+            data.append(0 if column else MISSING)
+            self.store_value(row, column, value)
+        if len(record) != len(COLUMNS) or tuple(record) != tuple(COLUMNS):
+            extras = {key: value for key, value in record.items() if key not in COLUMN_INDEX}
+            self.layouts[row] = (tuple(record), extras)
+            self.irregular_rows.add(row)
+
+    def get(self, row, column):
+        overrides = self.overrides
+        if overrides and (row, column) in overrides:
+            return overrides[(row, column)]
+        value = self.columns[column][row]
+        name = COLUMNS[column]
+        if name in BOOL_COLUMNS:
+            return value == 1
+        if name in POOLED_COLUMNS:
+            return self.pool.values[value]
+        return value
+
+    def set(self, row, column, value):
+        """Change a value and mark its row as edited"""
+        self.store_value(row, column, value)
+        self.dirty_rows.add(row)
+        if self.json_cache is not None:
+            self.stale_rows.add(row)
+
+    def mark_saved(self):
+        self.dirty_rows.clear()
+
+    def store_value(self, row, column, value):
+        """Store value, falling back to overrides when it does not fit the column"""
+        name = COLUMNS[column]
+        data = self.columns[column]
+        fits = True
+        if name == "Id":
+            data[row] = value
+            fits = type(value) is str
+        elif name in BOOL_COLUMNS:
+            fits = value is True or value is False
+            data[row] = 1 if value is True else 0
+        elif name in INT_COLUMNS:
+            fits = type(value) is int and INT_MIN <= value <= INT_MAX
+            data[row] = value if fits else 0
+        elif name in LIST_COLUMNS:
+            fits = isinstance(value, (list, tuple)) and all(type(item) is str for item in value)
+            if fits:
+                key = tuple(value)
+                code = self.pool.codes.get(key)
+                if code is None:
+                    code = self.pool.code(tuple(sys.intern(item) for item in key))
+                data[row] = code
+        else:
+            fits = type(value) is str
+            if fits:
+                data[row] = self.pool.code(sys.intern(value))
+
+        key = (row, column)
+        if fits:
+            if key in self.overrides:
+                del self.overrides[key]
+                if row not in self.layouts and not any((row, c) in self.overrides for c in range(len(COLUMNS))):
+                    self.irregular_rows.discard(row)
+        else:
+            self.overrides[key] = value
+            self.irregular_rows.add(row)
+
+    def record(self, row):
+        """Rebuild the JSON object for row"""
+        layout = self.layouts.get(row)
+        if layout is None:
+            keys, extras = COLUMNS, None
+        else:
+            keys, extras = layout
+            if keys is None:
+                return extras
+        result = {}
+        for key in keys:
+            column = COLUMN_INDEX.get(key)
+            if column is None:
+                result[key] = extras[key]
+                continue
+            value = self.get(row, column)
+            if value is not MISSING:
+                result[key] = list(value) if isinstance(value, tuple) else value
+        # Columns set on a record that did not have them originally go at the end
+        if layout is not None:
+            for column, name in enumerate(COLUMNS):
+                if name not in result and name not in keys:
+                    value = self.get(row, column)
+                    if value is not MISSING:
+                        result[name] = list(value) if isinstance(value, tuple) else value
+        return result
+
+    def records(self):
+        return [self.record(row) for row in range(len(self))]
+
+    def snapshot(self):
+        """Copy the rows into a new store sharing this store's pool.
+
+        The pool only ever grows, so sharing it is safe and the copy costs
+        little more than the column arrays.
+        """
+        copy = ParameterStore()
+        copy.pool = self.pool
+        copy.pool_json = self.pool_json
+        copy.columns = [data[:] for data in self.columns]
+        copy.overrides = dict(self.overrides)
+        copy.layouts = dict(self.layouts)
+        copy.irregular_rows = set(self.irregular_rows)
+        return copy
+
+    def delete_rows(self, rows):
+        """Remove rows and return their records, in ascending row order"""
+        rows = sorted(set(rows))
+        if not rows:
+            return []
+        records = [self.record(row) for row in rows]
+        for column, data in enumerate(self.columns):
+            kept = data[:0]
+            start = 0
+            for row in rows:
+                kept.extend(data[start:row])
+                start = row + 1
+            kept.extend(data[start:])
+            self.columns[column] = kept
+
+        def moved(row):
+            position = bisect_left(rows, row)
+            if position < len(rows) and rows[position] == row:
+                return None
+            return row - position
+        self.remap_rows(moved)
+        return records
+
+    def insert_records(self, positions, records):
+        """Insert records so that each one ends up at the matching row in positions.
+
+        positions must be ascending, as returned alongside the records by
+        delete_rows, so deleting and re-inserting restores the original order.
+        """
+        if not records:
+            return
+        # Encode the new records with a store sharing this pool, then splice its columns in
+        added = ParameterStore()
+        added.pool = self.pool
+        added.pool_json = self.pool_json
+        added.extend(records)
+        # Number of existing rows that come before each inserted record
+        before = [position - index for index, position in enumerate(positions)]
+        for column, data in enumerate(self.columns):
+            merged = data[:0]
+            start = 0
+            for index, row in enumerate(before):
+                merged.extend(data[start:row])
+                merged.append(added.columns[column][index])
+                start = row
+            merged.extend(data[start:])
+            self.columns[column] = merged
+
+        self.remap_rows(lambda row: row + bisect_right(before, row))
+        for (row, column), value in added.overrides.items():
+            self.overrides[(positions[row], column)] = value
+        for row, layout in added.layouts.items():
+            self.layouts[positions[row]] = layout
+        self.irregular_rows.update(positions[row] for row in added.irregular_rows)
+        self.dirty_rows.update(positions)
+
+    def remap_rows(self, moved):
+        """Renumber per-row bookkeeping after rows were inserted or deleted.
+
+        moved maps an old row to its new row, or None if it was deleted.
+        """
+        overrides = {}
+        for (row, column), value in self.overrides.items():
+            new_row = moved(row)
+            if new_row is not None:
+                overrides[(new_row, column)] = value
+        self.overrides = overrides
+        layouts = {}
+        for row, layout in self.layouts.items():
+            new_row = moved(row)
+            if new_row is not None:
+                layouts[new_row] = layout
+        self.layouts = layouts
+        self.irregular_rows = {moved(row) for row in self.irregular_rows} - {None}
+        self.dirty_rows = {moved(row) for row in self.dirty_rows} - {None}
+        # Row spans in the serialized text no longer line up; rebuild it on the next save
+        self.json_cache = None
+        self.json_patches = {}
+        self.stale_rows = set()
+        self.json_base = None
+
+    def serialize_row(self, row):
+        """Return the record as json.dump(..., indent=4) writes it inside Parameters"""
+        if row in self.irregular_rows:
+            text = json.dumps(self.record(row), indent=4)
+            return RECORD_INDENT + text.replace("\n", "\n" + RECORD_INDENT)
+        parts = [RECORD_INDENT, "{\n"]
+        last = len(COLUMNS) - 1
+        for column, name in enumerate(COLUMNS):
+            value = self.columns[column][row]
+            if name == "Id":
+                text = encode_basestring_ascii(value)
+            elif name in BOOL_COLUMNS:
+                text = "true" if value == 1 else "false"
+            elif name in INT_COLUMNS:
+                text = str(value)
+            else:
+                text = self.pool_json.get(value)
+                if text is None:
+                    text = self.render_pooled(value)
+            parts.append(FIELD_PREFIX[column])
+            parts.append(text)
+            parts.append("\n" if column == last else ",\n")
+        parts.append(RECORD_INDENT)
+        parts.append("}")
+        return "".join(parts)
+
+    def iter_rows_json(self):
+        """Yield the serialized rows of the Parameters array, comma separated.
+
+        The first call serializes every row and keeps the result, unless
+        end_json_cache() has provided it already. Later calls only
+        re-serialize rows edited since then and splice them between the
+        cached text of the untouched rows.
+        """
+        if self.json_cache is None or len(self.json_starts) != len(self):
+            self.build_json_cache()
+        for row in self.stale_rows:
+            self.json_patches[row] = self.serialize_row(row)
+        self.stale_rows.clear()
+        # Once a large share of rows has been patched, fold the patches into the cache
+        if len(self.json_patches) > len(self) // 4 + 1000:
+            self.build_json_cache()
+
+        cache = self.json_cache
+        position = 0
+        for row in sorted(self.json_patches):
+            yield cache[position:self.json_starts[row]]
+            yield self.json_patches[row]
+            position = self.json_ends[row]
+        yield cache[position:]
+
+    def build_json_cache(self):
+        parts = []
+        starts = array('q')
+        ends = array('q')
+        position = 0
+        for row in range(len(self)):
+            if row:
+                parts.append(",\n")
+                position += 2
+            text = self.serialize_row(row)
+            parts.append(text)
+            starts.append(position)
+            position += len(text)
+            ends.append(position)
+        self.json_cache = "".join(parts)
+        self.json_starts = starts
+        self.json_ends = ends
+        self.json_patches = {}
+        self.stale_rows = set()
+
+    def begin_json_cache(self, snapshot):
+        """Let end_json_cache() take the serialized rows of snapshot, a snapshot() of this store.
+
+        The caller runs snapshot.build_json_cache() off the GUI thread, which
+        is safe as it doesn't touch this store, so that even the first save
+        after loading a file only serializes the rows edited since.
+        """
+        self.json_base = snapshot
+
+    def end_json_cache(self, snapshot):
+        """Take the serialized rows snapshot has built, if rows still line up with it.
+
+        Nothing is taken if a save built the cache meanwhile or rows were
+        added or removed since begin_json_cache(). Rows edited since are
+        serialized again on the next save. Returns whether they were taken.
+        """
+        taken = (snapshot is self.json_base and self.json_cache is None
+                 and snapshot.json_cache is not None and len(snapshot) == len(self))
+        if snapshot is self.json_base:
+            self.json_base = None
+        if taken:
+            self.json_cache = snapshot.json_cache
+            self.json_starts = snapshot.json_starts
+            self.json_ends = snapshot.json_ends
+            self.json_patches = {}
+            self.stale_rows = set(self.dirty_rows)
+        # The snapshot is kept for other uses; it needn't hold on to the text
+        snapshot.json_cache = None
+        snapshot.json_starts = array('q')
+        snapshot.json_ends = array('q')
+        return taken
+
+    def render_pooled(self, code):
+        value = self.pool.values[code]
+        if isinstance(value, str):
+            text = encode_basestring_ascii(value)
+        elif value:
+            items = (LIST_ITEM_INDENT + encode_basestring_ascii(item) for item in value)
+            text = "[\n" + ",\n".join(items) + "\n" + FIELD_INDENT + "]"
+        else:
+            text = "[]"
+        self.pool_json[code] = text
+        return text
+
+
+# Indentation json.dump(..., indent=4) uses for a record inside the top-level Parameters array
+RECORD_INDENT = " " * 8
+FIELD_INDENT = " " * 12
+LIST_ITEM_INDENT = " " * 16
+FIELD_PREFIX = [FIELD_INDENT + encode_basestring_ascii(name) + ": " for name in COLUMNS]
+# Stands in for the Parameters array while the rest of the document is serialized
+_PARAMETERS_PLACEHOLDER = "\u0000parameters\u0000"
+
+
+def iter_document_json(document):
+    """Yield the text json.dump(document, f, indent=4) would write.
+
+    A ParameterStore under "Parameters" is written straight from its typed
+    columns instead of being turned back into dicts and lists first, and
+    only its rows edited since the previous save are serialized again.
+    """
+    store = document.get("Parameters") if isinstance(document, dict) else None
+    if not isinstance(store, ParameterStore):
+        yield json.dumps(document, indent=4)
+        return
+
+    text = json.dumps(dict(document, Parameters=_PARAMETERS_PLACEHOLDER), indent=4)
+    head, tail = text.split(json.dumps(_PARAMETERS_PLACEHOLDER), 1)
+    yield head
+    if len(store):
+        yield "[\n"
+        yield from store.iter_rows_json()
+        yield "\n    ]"
+    else:
+        yield "[]"
+    yield tail
+
+
+def write_document(document, f):
+    for chunk in iter_document_json(document):
+        f.write(chunk)
+
+
+def load_document(file_path):
+    """Read a parameters file, keeping its Parameters array in a ParameterStore"""
+    with open(file_path, 'r') as f:
+        text = f.read()
+    reader = DocumentReader(text)
+    store = ParameterStore()
+    for batch in reader.batches():
+        store.extend(batch)
+    document = reader.document
+    if isinstance(document.get("Parameters"), list):
+        document["Parameters"] = store
+    return document
+
+
+def save_document(document, file_path):
+    """Write document to file_path without ever leaving a partly written file"""
+    replace_file(file_path, lambda f: write_document(document, f))
+
+
+def replace_file(file_path, write, binary=False):
+    """Call write(f) on a temporary file and move it over file_path in one step.
+
+    The temporary file is in the same directory and is flushed to disk
+    before the rename, so file_path holds either the old or the new
+    contents, never a mix.
+    """
+    # Imported here rather than at the top so they stay off the startup path
+    import shutil
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix="." + os.path.basename(file_path) + ".",
+                                     suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+        else:
+            # mkstemp creates owner-only files; give new files the usual permissions
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+_PREDICATE = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*$')
+_COMPARISONS = {
+    "=": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+}
+
+
+def column_index(name):
+    column = COLUMN_INDEX.get(name)
+    if column is None:
+        raise ValueError(f"Unknown column '{name}'")
+    return column
+
+
+def compile_predicate(text):
+    """Compile "Column op value" into a test of (store, row).
+
+    The value is converted with the same rules as an edited cell. "~" tests
+    whether a list column contains the value, or a text column contains it
+    as a case-insensitive substring.
+    """
+    match = _PREDICATE.match(text)
+    if not match:
+        raise ValueError(f"Invalid condition '{text}'")
+    name, op, argument = match.groups()
+    column = column_index(name)
+
+    if op == "~":
+        if name in LIST_COLUMNS:
+            def contains(store, row):
+                value = store.get(row, column)
+                # Missing or non-list values (see ParameterStore.overrides) never match
+                return isinstance(value, (list, tuple)) and argument in value
+            return contains
+        needle = argument.lower()
+        return lambda store, row: needle in str(store.get(row, column)).lower()
+
+    value = parse_value(name, argument)
+    if name in LIST_COLUMNS:
+        value = tuple(value)
+    compare = _COMPARISONS[op]
+
+    def predicate(store, row):
+        try:
+            return compare(store.get(row, column), value)
+        except TypeError:
+            # A value of the wrong type (see ParameterStore.overrides) never matches
+            return False
+    return predicate
+
+
+def match_rows(store, id_pattern=None, predicates=()):
+    """Return the rows whose Id matches the glob id_pattern and every predicate"""
+    rows = range(len(store))
+    if id_pattern:
+        pattern = id_pattern.lower()
+        ids = store.ids
+        rows = [row for row in rows if fnmatch.fnmatchcase(str(ids[row]).lower(), pattern)]
+    for predicate in predicates:
+        rows = [row for row in rows if predicate(store, row)]
+    return list(rows)
+
+
+def set_operation(name, text):
+    value = parse_value(name, text)
+    return lambda old: value
+
+
+def scale_operation(name, factor):
+    if name not in INT_COLUMNS:
+        raise ValueError(f"Cannot scale non-numeric column '{name}'")
+    factor = float(factor)
+    return lambda old: int(round(old * factor)) if type(old) is int else old
+
+
+def append_operation(name, text):
+    if name not in LIST_COLUMNS:
+        raise ValueError(f"Cannot append to non-list column '{name}'")
+
+    def append(old):
+        if not isinstance(old, (list, tuple)):
+            return [text]
+        return old if text in old else list(old) + [text]
+    return append
+
+
+_EXPRESSION_FUNCTIONS = {"abs": abs, "round": round, "min": min, "max": max, "int": int}
+# Largest exponent allowed after **; anything bigger (or computed) could take forever on an int
+MAX_EXPONENT = 16
+_EXPRESSION_NODES = ("Expression", "BinOp", "UnaryOp", "Constant", "Name", "Load", "Call",
+                     "Add", "Sub", "Mult", "Div", "FloorDiv", "Mod", "Pow", "USub", "UAdd")
+
+
+def compile_expression(text):
+    """Compile an arithmetic expression of the current value x into a function.
+
+    Only numbers, x, arithmetic operators and the functions abs, round, min,
+    max and int are allowed. The exponent of ** must be a number no larger
+    than MAX_EXPONENT, and a power can't be raised to a power again.
+    """
+    # Imported here; ast is slow to import and only needed for bulk edits
+    import ast
+    allowed = tuple(getattr(ast, name) for name in _EXPRESSION_NODES)
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError(f"Invalid expression '{text}'")
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed):
+            raise ValueError(f"Unsupported syntax in expression '{text}'")
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float):
+            raise ValueError(f"Only numbers are allowed in expression '{text}'")
+        if isinstance(node, ast.Name) and node.id != "x" and node.id not in _EXPRESSION_FUNCTIONS:
+            raise ValueError(f"Unknown name '{node.id}' in expression '{text}'")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.keywords):
+            raise ValueError(f"Unsupported call in expression '{text}'")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            exponent = node.right
+            if isinstance(exponent, ast.UnaryOp) and isinstance(exponent.op, (ast.USub, ast.UAdd)):
+                exponent = exponent.operand
+            if not isinstance(exponent, ast.Constant) or abs(exponent.value) > MAX_EXPONENT:
+                raise ValueError(f"The exponent after ** must be a number up to {MAX_EXPONENT} in '{text}'")
+            if any(isinstance(inner, ast.Pow) for inner in ast.walk(node.left)):
+                raise ValueError(f"Powers of powers are not allowed in expression '{text}'")
+    code = compile(tree, "<expression>", "eval")
+    namespace = {"__builtins__": {}}
+    namespace.update(_EXPRESSION_FUNCTIONS)
+    return lambda x: eval(code, namespace, {"x": x})
+
+
+def expression_operation(name, text):
+    if name not in INT_COLUMNS:
+        raise ValueError(f"Expressions only work on numeric columns, not '{name}'")
+    expression = compile_expression(text)
+
+    def evaluate(old):
+        if type(old) is not int:
+            return old
+        return int(round(expression(old)))
+    return evaluate
+
+
+OPERATIONS = {"set": set_operation, "scale": scale_operation, "append": append_operation,
+              "expression": expression_operation}
+
+
+def apply_operation(store, rows, column, function, previous=None):
+    """Replace the value of column in rows with function(old value).
+
+    Returns the rows that actually changed. If previous is a list, the old
+    value of each changed row is appended to it. Every new value is worked
+    out before any is written, so if function raises the store is left as
+    it was.
+    """
+    changed = []
+    old_values = []
+    new_values = []
+    for row in rows:
+        old = store.get(row, column)
+        new = function(old)
+        if isinstance(new, list):
+            new = tuple(new)
+        if new != old or type(new) is not type(old):
+            changed.append(row)
+            old_values.append(old)
+            new_values.append(new)
+    for row, new in zip(changed, new_values):
+        store.set(row, column, new)
+    if previous is not None:
+        previous.extend(old_values)
+    return changed
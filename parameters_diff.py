@@ -0,0 +1,340 @@
+"""Row by row comparison of two ParameterStores, matched on Id.
+
+Like parameters_core, this module does not import PyQt.
+"""
+from array import array
+from itertools import compress, repeat
+from operator import lt, ne, not_
+
+from parameters_core import COLUMNS, POOLED_COLUMNS
+from undo import Change, RowsInserted, RowsRemoved
+
+# Rows compared at a time when looking for changed stretches of a column
+CHUNK = 4096
+
+SAME = "same"
+CHANGED = "changed"
+# Only in the left (open) file, or only in the right (other) file
+REMOVED = "removed"
+ADDED = "added"
+
+
+def gather(data, rows):
+    return list(map(data.__getitem__, rows))
+
+
+class ParametersDiff:
+    """Pairs the rows of left and right by Id and records which columns differ.
+
+    Rows are matched with a hash join: each Id in right is looked up in a
+    dict of the left Ids, and duplicate Ids pair up in file order. Rows
+    without a string Id are never matched. Entry i of the diff is the pair
+    left_rows[i], right_rows[i], where -1 means the row has no partner; the
+    left rows come first in their own order, then the rows only in right.
+    masks[i] has bit c set when column c differs.
+
+    Matched rows are compared on the raw column arrays, translating pool
+    codes from right to left, so no values are rebuilt except for the
+    irregular rows that keep overrides. Runs of rows that line up in both
+    files are compared CHUNK rows at a time with slice comparisons, so the
+    row by row work grows with the number of differences, not the file.
+    """
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.left_rows = array('q')
+        self.right_rows = array('q')
+        self.masks = array('I')
+        # Entries for rows that are only in left
+        self.removed = []
+        self.build()
+
+    def __len__(self):
+        return len(self.left_rows)
+
+    def build(self):
+        left, right = self.left, self.right
+        string_ids = set(map(type, left.ids)) <= {str} and set(map(type, right.ids)) <= {str}
+        if string_ids and left.ids == right.ids:
+            # Same Ids in the same order, as when comparing two versions of one file
+            partner = array('q', range(len(left)))
+            right_only = array('q')
+        else:
+            partner, right_only = self.join(left.ids, right.ids, string_ids)
+            if partner.count(-1):
+                self.removed = list(compress(range(len(left)), map(lt, partner, repeat(0))))
+        self.left_rows = array('q', range(len(left)))
+        self.left_rows.extend(array('q', [-1]) * len(right_only))
+        self.right_rows = partner
+        self.right_rows.extend(right_only)
+        self.masks = array('I', bytes(4 * len(self.left_rows)))
+
+        translate = [left.pool.codes.get(value, -1) for value in right.pool.values]
+        # Pools filled from the same file in the same order give every value the same
+        # code; then codes can be compared directly, as long as values only in right
+        # have codes that left does not use
+        known = len(left.pool.values)
+        same_codes = all(code == index or (code == -1 and index >= known)
+                         for index, code in enumerate(translate))
+
+        for start in range(0, len(left), CHUNK):
+            stop = min(start + CHUNK, len(left))
+            first = partner[start]
+            if first >= 0 and partner[start:stop] == array('q', range(first, first + stop - start)):
+                self.compare_block(start, stop, first, translate, same_codes)
+            else:
+                self.compare_rows_in(start, stop, translate)
+
+        # Rows with overrides hold placeholders in the arrays; compare their real values
+        for left_row in left.irregular_rows:
+            if partner[left_row] >= 0:
+                self.masks[left_row] = self.compare_rows(left_row, partner[left_row])
+        if right.irregular_rows:
+            left_of = dict(zip(partner, range(len(left))))
+            for right_row in right.irregular_rows:
+                left_row = left_of.get(right_row)
+                if left_row is not None:
+                    self.masks[left_row] = self.compare_rows(left_row, right_row)
+
+    def compare_block(self, start, stop, first, translate, same_codes):
+        """Compare left rows start to stop with the right rows from first on, in the same order"""
+        masks = self.masks
+        end = first + stop - start
+        # Matched rows share their Id, so the comparison starts at the second column
+        for column, name in enumerate(COLUMNS[1:], 1):
+            left_values = self.left.columns[column][start:stop]
+            right_values = self.right.columns[column][first:end]
+            if name in POOLED_COLUMNS and not same_codes:
+                right_values = list(map(translate.__getitem__, right_values))
+            # Equal stretches are skipped with one slice comparison
+            if left_values == right_values:
+                continue
+            bit = 1 << column
+            for index in compress(range(start, stop), map(ne, left_values, right_values)):
+                masks[index] |= bit
+
+    def compare_rows_in(self, start, stop, translate):
+        """Compare left rows start to stop with whichever right rows they were paired with"""
+        masks = self.masks
+        matched = [row for row in range(start, stop) if self.right_rows[row] >= 0]
+        right_matched = gather(self.right_rows, matched)
+        for column, name in enumerate(COLUMNS[1:], 1):
+            left_values = gather(self.left.columns[column], matched)
+            right_values = gather(self.right.columns[column], right_matched)
+            if name in POOLED_COLUMNS:
+                right_values = map(translate.__getitem__, right_values)
+            bit = 1 << column
+            for index in compress(matched, map(ne, left_values, right_values)):
+                masks[index] |= bit
+
+    @staticmethod
+    def join(left_ids, right_ids, string_ids):
+        """Return the right row paired with each left row, and the right rows left over"""
+        if string_ids:
+            right_by_id = dict(zip(right_ids, range(len(right_ids))))
+            left_set = set(left_ids)
+            if len(right_by_id) == len(right_ids) and len(left_set) == len(left_ids):
+                # Unique Ids on both sides: look them all up at once
+                partner = array('q', list(map(right_by_id.get, left_ids, repeat(-1))))
+                right_only = array('q')
+                if len(partner) - partner.count(-1) < len(right_ids):
+                    right_only.extend(compress(range(len(right_ids)),
+                                               map(not_, map(left_set.__contains__, right_ids))))
+                return partner, right_only
+
+        by_id = {}
+        for row, row_id in enumerate(left_ids):
+            if type(row_id) is str:
+                rows = by_id.get(row_id)
+                if rows is None:
+                    by_id[row_id] = row
+                elif type(rows) is int:
+                    by_id[row_id] = [rows, row]
+                else:
+                    rows.append(row)
+
+        partner = array('q', [-1]) * len(left_ids)
+        right_only = array('q')
+        for row, row_id in enumerate(right_ids):
+            rows = by_id.get(row_id) if type(row_id) is str else None
+            if rows is None:
+                right_only.append(row)
+            elif type(rows) is int:
+                partner[rows] = row
+                del by_id[row_id]
+            else:
+                partner[rows.pop(0)] = row
+                if not rows:
+                    del by_id[row_id]
+        return partner, right_only
+
+    def compare_rows(self, left_row, right_row):
+        mask = 0
+        for column in range(len(COLUMNS)):
+            if self.left.get(left_row, column) != self.right.get(right_row, column):
+                mask |= 1 << column
+        return mask
+
+    def status(self, index):
+        if self.left_rows[index] < 0:
+            return ADDED
+        if self.right_rows[index] < 0:
+            return REMOVED
+        return CHANGED if self.masks[index] else SAME
+
+    def counts(self):
+        """Number of entries with each status"""
+        changed = sum(1 for _ in compress(self.masks, self.masks))
+        added = len(self) - len(self.left)
+        removed = len(self.removed)
+        return {SAME: len(self) - changed - added - removed, CHANGED: changed, REMOVED: removed, ADDED: added}
+
+    def differing(self):
+        """Indexes of the entries that are not the same in both files"""
+        # Only matched entries have mask bits set, so the three parts never overlap
+        entries = list(compress(range(len(self.left)), self.masks))
+        if self.removed:
+            entries = sorted(entries + self.removed)
+        entries.extend(range(len(self.left), len(self)))
+        return entries
+
+
+def build_changes(store, cells, removed, added):
+    """Turn edits to store into undoable changes, to be applied in order.
+
+    cells maps a column to the rows to change and their new values, removed
+    lists rows to delete and added lists records to append once the removed
+    rows are gone.
+    """
+    changes = [Change(column, rows, [store.get(row, column) for row in rows], values)
+               for column, (rows, values) in sorted(cells.items())]
+    if removed:
+        removed = sorted(removed)
+        changes.append(RowsRemoved(removed, [store.record(row) for row in removed]))
+    if added:
+        first = len(store) - len(removed)
+        changes.append(RowsInserted(range(first, first + len(added)), added))
+    return changes
+
+
+def changes_to_match(diff, entries=None):
+    """The changes that make diff's left rows match its right ones, for entries (default: all that differ).
+
+    Rows only on the right are appended to the left.
+    """
+    left, right = diff.left, diff.right
+    cells = {}
+    removed = []
+    added = []
+    for entry in diff.differing() if entries is None else entries:
+        status = diff.status(entry)
+        left_row, right_row = diff.left_rows[entry], diff.right_rows[entry]
+        if status == CHANGED:
+            for column in range(len(COLUMNS)):
+                if diff.masks[entry] & (1 << column):
+                    rows, values = cells.setdefault(column, ([], []))
+                    rows.append(left_row)
+                    values.append(right.get(right_row, column))
+        elif status == REMOVED:
+            removed.append(left_row)
+        elif status == ADDED:
+            added.append(right_row)
+    return build_changes(left, cells, removed, [right.record(row) for row in added])
+
+
+def rows_by_id(ids, wanted):
+    """Map each Id in wanted to the rows that have it, in order"""
+    rows = {}
+    for row, row_id in enumerate(ids):
+        if type(row_id) is str and row_id in wanted:
+            rows.setdefault(row_id, []).append(row)
+    return rows
+
+
+def merge_changes(local, base, disk):
+    """Work out how to bring the changes made on disk since base into local.
+
+    base is the file as it was last read or written and disk is what it
+    holds now. Cells changed on disk are copied into local unless they were
+    also changed in local to something else; rows removed or added on disk
+    are removed or added unless local changed them too. Rows are matched on
+    Id, so only the rows that differ between base and disk are looked at.
+
+    Returns the changes for build_changes' caller to apply and the Ids of the
+    rows left alone because of a conflicting local edit.
+    """
+    diff = ParametersDiff(base, disk)
+    entries = diff.differing()
+    cells = {}
+    removed = []
+    added = []
+    conflicts = []
+    if not entries:
+        return [], conflicts
+
+    if local.ids == base.ids:
+        # No rows were added or removed locally, so base rows are local rows
+        def local_row(base_row):
+            return base_row
+        base_rows = local_rows = {}
+    else:
+        wanted = set()
+        for entry in entries:
+            row = diff.left_rows[entry]
+            wanted.add(base.ids[row] if row >= 0 else disk.ids[diff.right_rows[entry]])
+        base_rows = rows_by_id(base.ids, wanted)
+        local_rows = rows_by_id(local.ids, wanted)
+
+        def local_row(base_row):
+            row_id = base.ids[base_row]
+            if type(row_id) is not str:
+                return None
+            # The n-th row with an Id in base is the n-th row with it in local
+            occurrence = base_rows[row_id].index(base_row)
+            rows = local_rows.get(row_id, ())
+            return rows[occurrence] if occurrence < len(rows) else None
+
+    def same_row(store, row, other, other_row):
+        return all(store.get(row, column) == other.get(other_row, column) for column in range(len(COLUMNS)))
+
+    for entry in entries:
+        base_row, disk_row = diff.left_rows[entry], diff.right_rows[entry]
+        if base_row < 0:
+            # Added on disk; a row with the same new Id added locally as well is a conflict
+            row_id = disk.ids[disk_row]
+            if row_id in local_rows and row_id not in base_rows:
+                row = local_rows[row_id][0]
+                if not same_row(local, row, disk, disk_row):
+                    conflicts.append(row_id)
+                continue
+            added.append(disk.record(disk_row))
+            continue
+        row = local_row(base_row)
+        if row is None:
+            # Removed locally; a change on disk to it is a conflict
+            if disk_row >= 0:
+                conflicts.append(base.ids[base_row])
+            continue
+        if disk_row < 0:
+            if same_row(local, row, base, base_row):
+                removed.append(row)
+            else:
+                conflicts.append(base.ids[base_row])
+            continue
+        mask = diff.masks[entry]
+        conflict = False
+        for column in range(len(COLUMNS)):
+            if not mask & (1 << column):
+                continue
+            value = local.get(row, column)
+            new = disk.get(disk_row, column)
+            if value == base.get(base_row, column):
+                rows, values = cells.setdefault(column, ([], []))
+                rows.append(row)
+                values.append(new)
+            elif value != new:
+                conflict = True
+        if conflict:
+            conflicts.append(base.ids[base_row])
+    return build_changes(local, cells, removed, added), conflicts
@@ -0,0 +1,167 @@
+"""Timing of editor operations, for finding out where a slow session spends its time.
+
+Operations are wrapped in monitor.measure(name); each finished measurement
+records its duration, the number of rows involved and the change in the
+process's resident memory, is passed to every listener and can be appended
+to a rolling JSON lines log. While the monitor is disabled, measure() hands
+back a shared no-op measurement, so instrumented code costs one attribute
+check. Like parameters_core, this module does not import PyQt.
+"""
+import json
+import os
+import sys
+import time
+
+# The log is moved aside to PATH.1 once it grows past this size
+DEFAULT_MAX_LOG_BYTES = 1024 * 1024
+
+
+def memory_usage():
+    """Resident memory of this process in bytes, or None if it can't be read"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                        "PagefileUsage", "PeakPagefileUsage")]
+
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return None
+            return counters.WorkingSetSize
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+class Measurement:
+    """One timed run of an operation; set rows before it finishes to record them"""
+    __slots__ = ("monitor", "name", "rows", "started", "memory")
+
+    def __init__(self, monitor, name, rows=None):
+        self.monitor = monitor
+        self.name = name
+        self.rows = rows
+        self.memory = memory_usage()
+        self.started = time.perf_counter()
+
+    def finish(self, rows=None, error=None):
+        seconds = time.perf_counter() - self.started
+        memory = memory_usage()
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "operation": self.name,
+            "seconds": round(seconds, 6),
+            "rows": self.rows if rows is None else rows,
+            "memory_delta": memory - self.memory if memory is not None and self.memory is not None else None,
+        }
+        if error is not None:
+            entry["error"] = error
+        self.monitor.record(entry)
+        return entry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.finish(error=kind.__name__ if kind is not None else None)
+        return False
+
+
+class NullMeasurement:
+    """Stands in for Measurement while the monitor is disabled"""
+    __slots__ = ()
+
+    rows = None
+
+    def __setattr__(self, name, value):
+        pass
+
+    def finish(self, rows=None, error=None):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+
+NULL_MEASUREMENT = NullMeasurement()
+
+
+class PerfMonitor:
+    """Collects measurements and hands them to listeners and the log"""
+
+    def __init__(self):
+        self.enabled = False
+        self.listeners = []
+        self.last = None
+        self.log_path = None
+        self.max_log_bytes = DEFAULT_MAX_LOG_BYTES
+        self.profiler = None
+
+    def measure(self, name, rows=None):
+        """Start timing name; use as a context manager or call finish() when done"""
+        if not self.enabled:
+            return NULL_MEASUREMENT
+        return Measurement(self, name, rows)
+
+    def record(self, entry):
+        self.last = entry
+        if self.log_path:
+            self.write_log(entry)
+        for listener in self.listeners:
+            listener(entry)
+
+    def write_log(self, entry):
+        try:
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.max_log_bytes:
+                os.replace(self.log_path, self.log_path + ".1")
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Failed to write performance log: {e}")
+
+    @property
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        """Profile everything the application does until stop_profile()"""
+        if self.profiler is None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, file_path=None):
+        """Stop profiling and write the stats to file_path for pstats or snakeviz"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is None:
+            return
+        profiler.disable()
+        if file_path:
+            profiler.dump_stats(file_path)
+
+
+def format_entry(entry):
+    """Short text for the status bar, e.g. 'save_file 0.213 s, 200000 rows, +3.1 MB'"""
+    text = f"{entry['operation']} {entry['seconds']:.3f} s"
+    if entry["rows"] is not None:
+        text += f", {entry['rows']} rows"
+    if entry["memory_delta"] is not None:
+        text += f", {entry['memory_delta'] / 1024 / 1024:+.1f} MB"
+    if entry.get("error"):
+        text += f" ({entry['error']})"
+    return text
+
+
+monitor = PerfMonitor()
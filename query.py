@@ -0,0 +1,323 @@
+"""Structured queries over the Parameters columns, such as
+
+    CooldownGroup = Ammo and CooldownPerSquadMemberMin > 30 and AllowedLocations contains Coastal
+
+Conditions take the form COLUMN OP VALUE with OP one of = != < <= > >= and
+contains (or ~), and combine with and, or, not and parentheses. Values use
+the same rules as editing a cell; quote a value that contains spaces around
+and/or, or any of ( ) = < > ! ~. A query is compiled once and answered from
+sorted per-column indexes rather than by testing every row. Like
+parameters_core, this module does not import PyQt.
+"""
+import json
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import compress, repeat
+
+from parameters_core import BOOL_COLUMNS, COLUMNS, LIST_COLUMNS, POOLED_COLUMNS, parse_value
+
+_TOKEN = re.compile(r'''\s*(?:(?P<string>"(?:[^"\\]|\\.)*"|'[^']*')|(?P<op><=|>=|!=|=|<|>|~)'''
+                    r'''|(?P<paren>[()])|(?P<word>[^\s()"'=<>!~]+))''')
+_COLUMNS_BY_NAME = {name.lower(): column for column, name in enumerate(COLUMNS)}
+_KEYWORDS = {"and", "or", "not"}
+_OPERATORS = {"=", "!=", "<", "<=", ">", ">=", "contains"}
+
+
+def mark(mask, rows):
+    """Set mask[row] to 1 for every row"""
+    deque(map(mask.__setitem__, rows, repeat(1)), maxlen=0)
+
+
+class ColumnIndex:
+    """The rows of one column ordered by their stored value.
+
+    Ints and bools are ordered by value and pooled columns by pool code, so
+    a lookup is a bisect into keys and the matching rows are one slice of
+    rows. Cells kept in the store's overrides have a placeholder in the
+    column and are listed separately in overrides.
+    """
+
+    def __init__(self, store, column):
+        data = store.columns[column]
+        if column == 0:
+            keys = [value if type(value) is str else "" for value in data]
+        else:
+            keys = data
+        self.rows = array('q', sorted(range(len(data)), key=keys.__getitem__))
+        if column == 0:
+            self.keys = [keys[row] for row in self.rows]
+        else:
+            self.keys = array(data.typecode if isinstance(data, array) else 'B', map(data.__getitem__, self.rows))
+        self.overrides = {row: value for (row, override_column), value in store.overrides.items()
+                          if override_column == column}
+
+    def equal(self, key):
+        return self.rows[bisect_left(self.keys, key):bisect_right(self.keys, key)]
+
+    def below(self, key, inclusive):
+        return self.rows[:(bisect_right if inclusive else bisect_left)(self.keys, key)]
+
+    def above(self, key, inclusive):
+        return self.rows[(bisect_left if inclusive else bisect_right)(self.keys, key):]
+
+
+class QueryIndexes:
+    """ColumnIndex objects for one store, built on first use.
+
+    An index stays valid until its column is edited; call invalidate() with
+    the column, or with no column after rows were added or removed.
+    """
+
+    def __init__(self, store, id_index=None):
+        self.store = store
+        self.id_index = id_index
+        self.indexes = {}
+
+    def invalidate(self, column=None):
+        if column is None:
+            self.indexes.clear()
+        else:
+            self.indexes.pop(column, None)
+
+    def index(self, column):
+        index = self.indexes.get(column)
+        if index is None:
+            index = self.indexes[column] = ColumnIndex(self.store, column)
+        return index
+
+
+class Condition:
+    """COLUMN OP VALUE, evaluated to a row mask"""
+
+    def __init__(self, column, op, text):
+        self.column = column
+        # != is answered as the rows that are not =
+        self.negate = op == "!="
+        self.op = "=" if self.negate else op
+        name = COLUMNS[column]
+        if op == "contains":
+            if name not in LIST_COLUMNS and name not in POOLED_COLUMNS and column != 0:
+                raise ValueError(f"'contains' only works on text and list columns, not {name}")
+            self.value = text if name in LIST_COLUMNS else text.lower()
+            return
+        try:
+            value = parse_value(name, text)
+        except ValueError:
+            raise ValueError(f"Invalid value '{text}' for {name}")
+        self.value = tuple(value) if name in LIST_COLUMNS else value
+
+    def test(self, value):
+        """Whether one value matches, for pool values and overridden cells"""
+        try:
+            if self.op == "contains":
+                if isinstance(value, tuple):
+                    return self.value in value
+                return isinstance(value, str) and self.value in value.lower()
+            if self.op == "=":
+                return value == self.value
+            if self.op == "<":
+                return value < self.value
+            if self.op == "<=":
+                return value <= self.value
+            if self.op == ">":
+                return value > self.value
+            return value >= self.value
+        except TypeError:
+            # A value of the wrong type (see ParameterStore.overrides) never matches
+            return False
+
+    def matching_rows(self, indexes):
+        """Rows that match, ignoring overridden cells"""
+        name = COLUMNS[self.column]
+        store = indexes.store
+        if self.column == 0 and self.op in ("contains", "="):
+            # Find ID's substring index answers these without sorting the Ids
+            ids = store.ids
+            if indexes.id_index is not None:
+                rows = indexes.id_index.search(self.value.lower())
+            else:
+                rows = [row for row, value in enumerate(ids) if self.value.lower() in str(value).lower()]
+            if self.op == "=":
+                rows = [row for row in rows if ids[row] == self.value]
+            return rows
+        index = indexes.index(self.column)
+        if name in POOLED_COLUMNS:
+            # Test each distinct value once, then take the rows of the ones that match
+            rows = []
+            for code, value in enumerate(store.pool.values):
+                if self.test(value):
+                    rows.extend(index.equal(code))
+            return rows
+        key = self.value
+        if name in BOOL_COLUMNS:
+            key = 1 if key else 0
+        if self.op == "=":
+            return index.equal(key)
+        if self.op in ("<", "<="):
+            return index.below(key, self.op == "<=")
+        return index.above(key, self.op == ">=")
+
+    def evaluate(self, indexes):
+        mask = bytearray(len(indexes.store))
+        mark(mask, self.matching_rows(indexes))
+        if self.column == 0:
+            overrides = {row: value for (row, column), value in indexes.store.overrides.items() if column == 0}
+        else:
+            overrides = indexes.index(self.column).overrides
+        for row, value in overrides.items():
+            mask[row] = self.test(value)
+        result = int.from_bytes(mask, 'little')
+        if self.negate:
+            result ^= all_rows(len(mask))
+        return result
+
+
+def all_rows(count):
+    return int.from_bytes(b'\x01' * count, 'little')
+
+
+class Query:
+    """A compiled query; rows() returns the matching rows of a store in row order"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = []
+        consumed = 0
+        while True:
+            match = _TOKEN.match(text, consumed)
+            if match is None or match.end() == consumed:
+                break
+            kind = match.lastgroup
+            self.tokens.append((kind, match.group(kind), match.start(kind), match.end(kind)))
+            consumed = match.end()
+        if text[consumed:].strip():
+            raise ValueError(f"Unexpected '{text[consumed:].strip()}'")
+        self.position = 0
+        if not self.tokens:
+            raise ValueError("Empty query")
+        self.tree = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected '{self.tokens[self.position][1]}'")
+        del self.tokens
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self, expected="a condition"):
+        token = self.peek()
+        if token is None:
+            raise ValueError(f"Expected {expected} at the end of the query")
+        self.position += 1
+        return token
+
+    def keyword(self, word):
+        token = self.peek()
+        if token and token[0] == "word" and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.keyword("or"):
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.keyword("and"):
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.keyword("not"):
+            return ("not", self.parse_not())
+        token = self.next()
+        if token[0] == "paren" and token[1] == "(":
+            node = self.parse_or()
+            closing = self.next("')'")
+            if closing[1] != ")":
+                raise ValueError(f"Expected ')' but found '{closing[1]}'")
+            return node
+        if token[0] != "word":
+            raise ValueError(f"Expected a column name but found '{token[1]}'")
+        column = _COLUMNS_BY_NAME.get(token[1].lower())
+        if column is None:
+            raise ValueError(f"Unknown column '{token[1]}'")
+        op = self.next("an operator")
+        op_text = op[1].lower()
+        if op_text == "~":
+            op_text = "contains"
+        if op_text not in _OPERATORS:
+            raise ValueError(f"Expected an operator after {COLUMNS[column]} but found '{op[1]}'")
+        return ("condition", Condition(column, op_text, self.parse_value()))
+
+    def parse_value(self):
+        """The text up to the next and/or/')', or one quoted string"""
+        token = self.next("a value")
+        if token[0] == "string":
+            text = token[1]
+            return json.loads(text) if text.startswith('"') else text[1:-1]
+        start = end = token[2]
+        self.position -= 1
+        while True:
+            token = self.peek()
+            if token is None or token[0] == "paren" and token[1] == ")":
+                break
+            if token[0] == "word" and token[1].lower() in _KEYWORDS:
+                break
+            end = token[3]
+            self.position += 1
+        if end == start:
+            raise ValueError("Expected a value")
+        return self.text[start:end]
+
+    def mask(self, indexes, node=None):
+        node = self.tree if node is None else node
+        kind = node[0]
+        if kind == "condition":
+            return node[1].evaluate(indexes)
+        if kind == "not":
+            return self.mask(indexes, node[1]) ^ all_rows(len(indexes.store))
+        left = self.mask(indexes, node[1])
+        if kind == "and" and not left:
+            return 0
+        right = self.mask(indexes, node[2])
+        return left & right if kind == "and" else left | right
+
+    def rows(self, indexes):
+        count = len(indexes.store)
+        return list(compress(range(count), self.mask(indexes).to_bytes(count, 'little')))
+
+
+def sorted_rows(indexes, column, rows=None, descending=False):
+    """rows (default: all rows) ordered by column; cells that don't fit the column go last"""
+    store = indexes.store
+    index = indexes.index(column)
+    if COLUMNS[column] in POOLED_COLUMNS:
+        # Codes are handed out in file order; order them by the values they stand for
+        values = store.pool.values
+        codes = sorted(set(index.keys), key=lambda code: (isinstance(values[code], tuple), values[code]))
+        order = array('q')
+        for code in codes:
+            order.extend(index.equal(code))
+    else:
+        order = index.rows
+    if rows is not None:
+        wanted = bytearray(len(store))
+        mark(wanted, rows)
+        order = compress(order, map(wanted.__getitem__, order))
+    overrides = index.overrides
+    if overrides:
+        order = [row for row in order if row not in overrides]
+        last = [row for row in sorted(overrides) if rows is None or wanted[row]]
+    else:
+        order = list(order)
+        last = []
+    if descending:
+        order.reverse()
+    return order + last
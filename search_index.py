@@ -0,0 +1,95 @@
+"""Substring index used by Find ID."""
+from array import array
+from bisect import bisect_right
+
+
+class IdIndex:
+    """Case-insensitive substring index over the Id of every row.
+
+    The lowercased Ids are joined into one newline separated string so a
+    query is answered by repeated str.find calls over that string instead of
+    a Python level test per row. When a query extends the previous one, only
+    the previous matches are re-checked, so typing an Id narrows the result
+    set rather than searching from scratch on every keystroke.
+    """
+
+    SEPARATOR = "\n"
+
+    def __init__(self):
+        self.ids = []
+        self.haystack = None
+        self.offsets = array('q')
+        self.last_query = None
+        self.last_result = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set_ids(self, ids):
+        self.ids = [str(value).lower() for value in ids]
+        self.invalidate()
+
+    def extend(self, ids):
+        self.ids.extend(str(value).lower() for value in ids)
+        self.invalidate()
+
+    def update(self, row, value):
+        self.ids[row] = str(value).lower()
+        self.invalidate()
+
+    def restore(self, ids, haystack, offsets):
+        """Take lowercased Ids with the haystack and offsets build() would make for them"""
+        self.ids = ids
+        self.invalidate()
+        self.haystack = haystack
+        self.offsets = offsets
+
+    def invalidate(self):
+        self.haystack = None
+        self.last_query = None
+        self.last_result = None
+
+    def build(self):
+        """Join the Ids and record where each one starts"""
+        self.haystack = self.SEPARATOR.join(self.ids)
+        offsets = array('q')
+        position = 0
+        for value in self.ids:
+            offsets.append(position)
+            position += len(value) + 1
+        self.offsets = offsets
+
+    def search(self, query):
+        """Return the rows whose Id contains query, in row order"""
+        query = query.lower()
+        if not query:
+            return range(len(self.ids))
+        if self.SEPARATOR in query:
+            return []
+
+        if self.last_query is not None and self.last_query in query:
+            # Anything matching the longer query also matched the previous one
+            ids = self.ids
+            result = [row for row in self.last_result if query in ids[row]]
+        else:
+            result = self.scan(query)
+
+        self.last_query = query
+        self.last_result = result
+        return result
+
+    def scan(self, query):
+        if self.haystack is None:
+            self.build()
+        haystack = self.haystack
+        offsets = self.offsets
+        result = []
+        position = haystack.find(query)
+        while position != -1:
+            row = bisect_right(offsets, position) - 1
+            result.append(row)
+            # Continue from the start of the next Id so each row is reported once
+            if row + 1 >= len(offsets):
+                break
+            position = haystack.find(query, offsets[row + 1])
+        return result
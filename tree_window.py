@@ -0,0 +1,272 @@
+"""Read-only tree of any JSON file, for files and sections the table can't show."""
+import os
+
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtWidgets import QFrame, QHeaderView, QLabel, QMainWindow, QMessageBox, QTreeView, QVBoxLayout
+from PyQt5.QtCore import Qt
+
+from lazy_json import PAGE_SIZE, LazyDocument
+from perf import monitor
+
+# Text of the row standing for the children not listed yet
+MORE_COLOR = QtGui.QColor("#8a8a8a")
+
+
+class MoreRow:
+    """The last row of a container whose children haven't all been listed"""
+    __slots__ = ("parent",)
+
+    def __init__(self, parent):
+        self.parent = parent
+
+
+class TreeLoader(QtCore.QThread):
+    """Map the file and work out its columns off the GUI thread.
+
+    Listing the top of a document may mean skipping over a very large value,
+    so it is done here; deeper levels are listed as they are expanded.
+    """
+    loaded = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.columns = []
+
+    def run(self):
+        try:
+            self.document.open()
+            self.columns = self.document.infer_columns()
+            self.loaded.emit(self.document)
+        except Exception as e:
+            self.document.close()
+            self.failed.emit(str(e))
+
+
+class JsonTreeModel(QtCore.QAbstractItemModel):
+    """A LazyDocument as a tree: key, value, then one column per inferred key.
+
+    A container's children are listed when it is first expanded, PAGE_SIZE
+    at a time; a last "more" row lists the next page when double-clicked.
+    failed reports a part of the file that isn't valid JSON.
+    """
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, document, columns, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.fields = columns
+        self.root = document.root
+        # Container -> its MoreRow, created as containers are listed
+        self.more_rows = {}
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def has_more_row(self, node):
+        return not node.complete and bool(node.children)
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        if isinstance(node, MoreRow) or column >= self.columnCount():
+            return QtCore.QModelIndex()
+        if row < len(node.children):
+            return self.createIndex(row, column, node.children[row])
+        if row == len(node.children) and self.has_more_row(node):
+            more = self.more_rows.get(node)
+            if more is None:
+                more = self.more_rows[node] = MoreRow(node)
+            return self.createIndex(row, column, more)
+        return QtCore.QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.node(parent)
+        if isinstance(node, MoreRow):
+            return 0
+        return len(node.children) + (1 if self.has_more_row(node) else 0)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 2 + len(self.fields)
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        if isinstance(node, MoreRow) or parent.column() > 0:
+            return False
+        return self.document.has_children(node)
+
+    def canFetchMore(self, parent):
+        # Only the first page is listed by expanding; later ones by the more row
+        node = self.node(parent)
+        return not isinstance(node, MoreRow) and not node.complete and not node.children
+
+    def fetchMore(self, parent):
+        self.list_children(parent)
+
+    def list_children(self, parent):
+        """List the next page of the container at parent"""
+        node = self.node(parent)
+        if isinstance(node, MoreRow) or node.complete:
+            return
+        with monitor.measure("list_json_children") as measurement:
+            try:
+                children, complete = self.document.read_children(node)
+            except ValueError as e:
+                # Keep what could be read and stop there
+                children, complete = [], True
+                self.failed.emit(f"Could not read {self.path(node)}: {e}")
+            measurement.rows = len(children)
+        first = len(node.children)
+        if not first:
+            # The first page, and the more row if there are further pages
+            rows = len(children) + (0 if complete else 1)
+            if rows:
+                self.beginInsertRows(parent, 0, rows - 1)
+                node.children.extend(children)
+                node.complete = complete
+                self.endInsertRows()
+            else:
+                node.complete = complete
+            return
+        # Later pages go in above the more row, which goes once there are no more
+        if children:
+            self.beginInsertRows(parent, first, first + len(children) - 1)
+            node.children.extend(children)
+            self.endInsertRows()
+        if complete:
+            row = len(node.children)
+            self.beginRemoveRows(parent, row, row)
+            node.complete = True
+            self.endRemoveRows()
+
+    def list_more(self, index):
+        """List the next page when index is a more row"""
+        more = index.internalPointer() if index.isValid() else None
+        if not isinstance(more, MoreRow):
+            return False
+        node = more.parent
+        parent = QtCore.QModelIndex() if node is self.root else self.createIndex(node.row, 0, node)
+        self.list_children(parent)
+        return True
+
+    def path(self, node):
+        keys = []
+        while node is not None and node is not self.root:
+            keys.append(f"[{node.key}]" if isinstance(node.key, int) else f".{node.key}")
+            node = node.parent
+        return "".join(reversed(keys)).lstrip(".") or "the top level"
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if isinstance(node, MoreRow):
+            if role == Qt.DisplayRole and column == 0:
+                return f"... more (double-click to list the next {PAGE_SIZE})"
+            if role == Qt.ForegroundRole:
+                return MORE_COLOR
+            return None
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return str(node.key)
+            if column == 1:
+                return self.document.summary(node)
+            return self.document.field(node, self.fields[column - 2])
+        if role == Qt.ToolTipRole and column == 0:
+            return self.path(node)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return ("Key", "Value")[section] if section < 2 else self.fields[section - 2]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+class JsonTreeWindow(QMainWindow):
+    """Shows a JSON file of any shape as a tree.
+
+    The file is memory-mapped and only the parts expanded are read, so even
+    very large files open at once. Columns beyond Key and Value are the keys
+    of the first objects found in arrays, so arrays of records read like a
+    table. Nothing can be edited here.
+    """
+
+    def __init__(self, editor, file_path):
+        super().__init__(editor)
+        self.file_path = file_path
+        self.document = LazyDocument(file_path)
+        self.model = None
+        self.initUI()
+        self.load_measurement = monitor.measure("open_json_tree")
+        self.loader = TreeLoader(self.document, self)
+        self.loader.loaded.connect(self.on_loaded)
+        self.loader.failed.connect(self.on_failed)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.loader.start()
+
+    def initUI(self):
+        self.setWindowTitle(f"JSON Tree - {os.path.basename(self.file_path)}")
+        self.resize(1200, 800)
+
+        self.summary_label = QLabel(f"Opening {self.file_path}...")
+
+        self.tree = QTreeView()
+        # Every row is one line high, so the view needn't measure rows it doesn't show
+        self.tree.setUniformRowHeights(True)
+        self.tree.setWordWrap(False)
+        self.tree.header().setSectionResizeMode(QHeaderView.Interactive)
+        self.tree.doubleClicked.connect(self.on_double_click)
+
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(self.summary_label)
+        main_layout.addWidget(self.tree)
+        main_layout.setStretch(1, 1)
+
+        central_widget = QFrame()
+        central_widget.setLayout(main_layout)
+        self.setCentralWidget(central_widget)
+
+    def on_loaded(self, document):
+        self.model = JsonTreeModel(document, self.loader.columns, self)
+        self.loader = None
+        self.model.failed.connect(lambda message: QMessageBox.warning(self, "JSON Tree", message))
+        self.tree.setModel(self.model)
+        self.tree.setColumnWidth(0, 250)
+        self.tree.setColumnWidth(1, 200)
+        root = document.root
+        self.load_measurement.finish(rows=len(root.children))
+        self.summary_label.setText(f"{self.file_path}: {document.summary(root)}")
+        # Top-level containers are listed already; open the first one
+        if len(root.children) == 1 and root.children[0].children:
+            self.tree.expand(self.model.index(0, 0))
+
+    def on_failed(self, message):
+        self.loader = None
+        self.load_measurement.finish(error=message)
+        self.summary_label.setText("")
+        QMessageBox.critical(self, "Error", f"Failed to open file: {message}")
+
+    def on_double_click(self, index):
+        self.model.list_more(index)
+
+    def closeEvent(self, event):
+        if self.loader is not None:
+            self.loader.wait()
+        self.document.close()
+        super().closeEvent(event)
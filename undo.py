@@ -0,0 +1,171 @@
+"""Undo/redo history for edits made in the editor."""
+from array import array
+from collections import deque
+
+# Rough cost of one changed cell: its row number plus a reference to the old
+# and to the new value. The values themselves are shared with the store.
+BYTES_PER_CELL = 24
+# Rough cost of keeping a whole record around as a dict
+BYTES_PER_RECORD = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class Change:
+    """The old and new values of one column for the rows an edit touched.
+
+    When every row got the same new value, as with a bulk set, new holds
+    that single value instead of a list.
+    """
+    __slots__ = ("column", "rows", "old", "new", "uniform")
+
+    def __init__(self, column, rows, old, new):
+        self.column = column
+        self.rows = array('q', rows)
+        self.old = old
+        first = new[0] if new else None
+        self.uniform = all(value is first or value == first for value in new)
+        self.new = first if self.uniform else new
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def size(self):
+        return (BYTES_PER_CELL - (8 if self.uniform else 0)) * len(self.rows)
+
+    def new_values(self):
+        if self.uniform:
+            return [self.new] * len(self.rows)
+        return self.new
+
+    def inverted(self):
+        """The change that undoes this one"""
+        return Change(self.column, self.rows, self.new_values(), self.old)
+
+    def first_row(self):
+        return self.rows[0]
+
+
+class RowsInserted:
+    """Records inserted so that each one lands at the matching row in positions"""
+    __slots__ = ("positions", "records")
+
+    def __init__(self, positions, records):
+        self.positions = list(positions)
+        self.records = records
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def size(self):
+        return BYTES_PER_RECORD * len(self.positions)
+
+    def inverted(self):
+        return RowsRemoved(self.positions, self.records)
+
+    def first_row(self):
+        return self.positions[0]
+
+
+class RowsRemoved(RowsInserted):
+    """Records removed from the given rows; the records are kept to put them back"""
+    __slots__ = ()
+
+    def inverted(self):
+        return RowsInserted(self.positions, self.records)
+
+
+class ChangeGroup:
+    """Several changes applied in order and undone together"""
+    __slots__ = ("changes",)
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    def __len__(self):
+        return sum(len(change) for change in self.changes)
+
+    @property
+    def size(self):
+        return sum(change.size for change in self.changes)
+
+    def inverted(self):
+        return ChangeGroup(change.inverted() for change in reversed(self.changes))
+
+    def first_row(self):
+        return self.changes[0].first_row()
+
+
+def apply_to_store(store, change):
+    """Apply change to store, a ParameterStore (or MappedParameterStore for Changes)"""
+    if isinstance(change, ChangeGroup):
+        for part in change.changes:
+            apply_to_store(store, part)
+    elif isinstance(change, RowsRemoved):
+        store.delete_rows(change.positions)
+    elif isinstance(change, RowsInserted):
+        store.insert_records(change.positions, change.records)
+    else:
+        column = change.column
+        for row, value in zip(change.rows, change.new_values()):
+            store.set(row, column, value)
+
+
+class UndoHistory:
+    """Bounded undo and redo stacks of Change objects.
+
+    When the changes held on both stacks take more than max_bytes, the
+    oldest undo entries are dropped first. The most recent change is always
+    kept, however large.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def record(self, change):
+        """Add a change that has just been applied"""
+        for dropped in self.redo_stack:
+            self.size -= dropped.size
+        self.redo_stack.clear()
+        self.undo_stack.append(change)
+        self.size += change.size
+        self.evict()
+
+    def undo(self):
+        """Return the change to revert, moving it to the redo stack"""
+        if not self.undo_stack:
+            return None
+        change = self.undo_stack.pop()
+        self.redo_stack.append(change)
+        return change
+
+    def redo(self):
+        """Return the change to apply again, moving it back to the undo stack"""
+        if not self.redo_stack:
+            return None
+        change = self.redo_stack.pop()
+        self.undo_stack.append(change)
+        return change
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def evict(self):
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft().size
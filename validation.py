@@ -0,0 +1,183 @@
+"""Checks of the Parameters rows, reported per cell.
+
+A cell is invalid when its value does not have its column's type (a text
+cooldown, a missing key), when CooldownPerSquadMemberMin is above
+CooldownPerSquadMemberMax, when its Id is empty or used by another row, or
+when its CooldownGroup is not one of the known groups (if a list of them is
+set). Like parameters_core, this module does not import PyQt.
+"""
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import compress, repeat
+from operator import eq, gt
+
+from parameters_core import (BOOL_COLUMNS, COLUMN_INDEX, COLUMNS, INT_COLUMNS, LIST_COLUMNS, MISSING,
+                             ParameterStore)
+
+ID = COLUMN_INDEX["Id"]
+MIN = COLUMN_INDEX["CooldownPerSquadMemberMin"]
+MAX = COLUMN_INDEX["CooldownPerSquadMemberMax"]
+GROUP = COLUMN_INDEX["CooldownGroup"]
+
+# Edits touching more rows than this are checked by a full pass off the GUI thread
+INCREMENTAL_LIMIT = 5000
+
+
+def type_problem(column, value):
+    """Why value doesn't belong in column, or None if it does"""
+    name = COLUMNS[column]
+    if value is MISSING:
+        return f"{name} is missing"
+    if name in BOOL_COLUMNS:
+        ok = type(value) is bool
+        expected = "true or false"
+    elif name in INT_COLUMNS:
+        ok = type(value) is int
+        expected = "a whole number"
+    elif name in LIST_COLUMNS:
+        ok = isinstance(value, (list, tuple)) and all(type(item) is str for item in value)
+        expected = "a list of text"
+    else:
+        ok = type(value) is str
+        expected = "text"
+    if ok:
+        return None
+    return f"{name} should be {expected}, not {type(value).__name__}"
+
+
+def row_problems(store, row, known_groups=None):
+    """The problems of row that don't depend on other rows, as {column: message}"""
+    problems = {}
+    values = [store.get(row, column) for column in range(len(COLUMNS))]
+    for column, value in enumerate(values):
+        problem = type_problem(column, value)
+        if problem:
+            problems[column] = problem
+    if values[ID] == "":
+        problems[ID] = "Id is empty"
+    low, high = values[MIN], values[MAX]
+    if type(low) is int and type(high) is int and low > high:
+        message = f"CooldownPerSquadMemberMin ({low}) is above CooldownPerSquadMemberMax ({high})"
+        problems[MIN] = problems[MAX] = message
+    group = values[GROUP]
+    if known_groups and type(group) is str and group not in known_groups:
+        problems[GROUP] = f"Unknown CooldownGroup '{group}'"
+    return problems
+
+
+def all_problems(store, known_groups=None):
+    """The row problems of every row of a ParameterStore, as {(row, column): message}.
+
+    The store is checked a column at a time: badly typed values are exactly
+    the store's overrides, and the other rules compare whole column arrays,
+    so only rows with a problem are looked at one by one.
+    """
+    count = len(store)
+    problems = {}
+    for (row, column), value in store.overrides.items():
+        problem = type_problem(column, value)
+        if problem:
+            problems[(row, column)] = problem
+    for row in compress(range(count), map(eq, store.ids, repeat(""))):
+        problems[(row, ID)] = "Id is empty"
+    # Overridden cells hold a placeholder in the arrays; row_problems works those rows out
+    irregular = store.irregular_rows
+    for row in compress(range(count), map(gt, store.columns[MIN], store.columns[MAX])):
+        if row not in irregular:
+            low, high = store.columns[MIN][row], store.columns[MAX][row]
+            message = f"CooldownPerSquadMemberMin ({low}) is above CooldownPerSquadMemberMax ({high})"
+            problems[(row, MIN)] = problems[(row, MAX)] = message
+    if known_groups:
+        values = store.pool.values
+        unknown = {code for code, value in enumerate(values) if type(value) is str and value not in known_groups}
+        if unknown:
+            for row in compress(range(count), map(unknown.__contains__, store.columns[GROUP])):
+                if row not in irregular:
+                    problems[(row, GROUP)] = f"Unknown CooldownGroup '{values[store.columns[GROUP][row]]}'"
+    for row in irregular:
+        for column, message in row_problems(store, row, known_groups).items():
+            problems[(row, column)] = message
+    return problems
+
+
+def duplicate_ids(ids):
+    """{row: number of rows with its Id} for the rows whose Id is not unique"""
+    if len(set(ids)) == len(ids):
+        return {}
+    repeated = {value: count for value, count in Counter(ids).items() if count > 1 and type(value) is str}
+    if not repeated:
+        return {}
+    return {row: repeated[value] for row, value in enumerate(ids) if value in repeated}
+
+
+class Validation:
+    """The problems found in a store, kept up to date as it is edited.
+
+    A full check (run() on a snapshot, usually off the GUI thread) is
+    installed with set_results(). After that, revalidate() re-checks just
+    the rows an edit touched; a row's problems only depend on the row
+    itself, except for duplicate Ids, which are recounted when an Id changes.
+    """
+
+    def __init__(self, known_groups=None):
+        self.known_groups = set(known_groups) if known_groups else None
+        # (row, column) -> message for the problems of single rows
+        self.cells = {}
+        # row -> number of rows sharing its Id
+        self.duplicates = {}
+        self.rows = None
+
+    def __len__(self):
+        return len(self.cells) + len(self.duplicates)
+
+    def run(self, store):
+        """Check every row of store, returning the results for set_results().
+
+        Stores that decode rows on demand (MappedParameterStore) only have
+        their Ids checked here; their other cells are checked as rows are edited.
+        """
+        cells = all_problems(store, self.known_groups) if isinstance(store, ParameterStore) else {}
+        return cells, duplicate_ids(store.ids)
+
+    def set_results(self, results):
+        self.cells, self.duplicates = results
+        self.rows = None
+
+    def clear(self):
+        self.set_results(({}, {}))
+
+    def revalidate(self, store, rows, column=None):
+        """Re-check rows after column (or any column) of them changed"""
+        for row in rows:
+            for other in range(len(COLUMNS)):
+                self.cells.pop((row, other), None)
+            for other, message in row_problems(store, row, self.known_groups).items():
+                self.cells[(row, other)] = message
+        if column is None or column == ID:
+            self.duplicates = duplicate_ids(store.ids)
+        self.rows = None
+
+    def message(self, row, column):
+        """What is wrong with a cell, or None"""
+        message = self.cells.get((row, column))
+        if column == ID and row in self.duplicates:
+            duplicate = f"Id is used by {self.duplicates[row]} rows"
+            return duplicate if message is None else f"{message}; {duplicate}"
+        return message
+
+    def problem_rows(self):
+        """The rows with a problem, ascending"""
+        if self.rows is None:
+            self.rows = sorted({row for row, column in self.cells} | set(self.duplicates))
+        return self.rows
+
+    def next_row(self, row, backwards=False):
+        """The first row with a problem after row (or before it), wrapping around; None if there are none"""
+        rows = self.problem_rows()
+        if not rows:
+            return None
+        if backwards:
+            position = bisect_left(rows, row)
+            return rows[position - 1]
+        position = bisect_right(rows, row)
+        return rows[position % len(rows)]